@@ -0,0 +1 @@
+"""Benchmarks for the NPS pipeline (run from the repository root)."""
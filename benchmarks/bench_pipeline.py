@@ -0,0 +1,119 @@
+"""Time each stage of the NPS pipeline on synthetic exports.
+
+For every dataset size the stages below run in order on freshly generated
+``hubspot``/``google_form`` CSVs, and the wall time and peak traced memory of
+each stage is reported. The pipeline runs twice: once untimed under
+``tracemalloc`` for the peaks, and once without tracing for the times, since
+tracing slows allocation-heavy stages by very different amounts:
+
+- ``load``: parse both CSVs
+- ``clean``: loader cleaning (header strip/rename, ratings, dates, categories)
+- ``per_survey``: per-survey and per-cohort statistics tables
+- ``csat``: CSAT split and CSAT table
+- ``yearly``: yearly NPS tables for both sources
+- ``quarterly``: NPS cube and the three trend series
+- ``combined``: ``clean_df`` of both sources, combined frame and combined yearly table
+
+Usage::
+
+    python -m benchmarks.bench_pipeline --sizes 10k 100k 1M 10M [--json results.json]
+"""
+
+import argparse
+import json
+import time
+import tracemalloc
+
+import pandas as pd
+
+from benchmarks.synthetic import OUT_DIR, parse_rows, write_dataset
+from nps.cube import build_cube
+from nps.loader import clean_df, clean_form, clean_hubspot
+from nps.metrics import rating_scales, score_buckets, summarise_csat, summarise_scores
+from nps.report import DATA_SOURCES, combined_yearly_nps, nps_trend, yearly_nps
+
+DEFAULT_SIZES = ['10k', '100k', '1M', '10M']
+
+
+def _run_stages(hubspot_path, form_path):
+    state = {}
+
+    def load():
+        state['raw_hubspot'] = pd.read_csv(hubspot_path)
+        state['raw_form'] = pd.read_csv(form_path)
+
+    def clean():
+        state['hubspot'] = clean_hubspot(state.pop('raw_hubspot'))
+        state['form'] = clean_form(state.pop('raw_form'))
+
+    def per_survey():
+        state['analysis'] = summarise_scores(state['hubspot'], 'Survey Name')
+        summarise_scores(state['form'], 'Cohort')
+
+    def csat():
+        analysis, hubspot = state['analysis'], state['hubspot']
+        scales = rating_scales(hubspot['Rating'], hubspot['Survey Name'])
+        df_csat = analysis[analysis['Survey Name'].map(scales) == 'CSAT']
+        state['csat'] = summarise_csat(df_csat, score_buckets(state['hubspot'], 'Survey Name'), 'Survey Name')
+
+    def yearly():
+        state['hubspot_yearly'] = yearly_nps(state['hubspot'], state['csat']['Survey Name'].unique())
+        state['form_yearly'] = yearly_nps(state['form'])
+
+    def quarterly():
+        cube = build_cube({'HubSpot': state['hubspot'], 'Google Form': state['form']})
+        for sources in DATA_SOURCES.values():
+            nps_trend(cube, sources)
+
+    def combined():
+        pd.concat([clean_df(state['hubspot'][['Rating', 'Date']]),
+                   clean_df(state['form'][['Rating', 'Date']])], ignore_index=True)
+        combined_yearly_nps(state['hubspot_yearly'], state['form_yearly'])
+
+    return [load, clean, per_survey, csat, yearly, quarterly, combined]
+
+
+def run(rows, data_dir=OUT_DIR):
+    """Benchmark every stage on ``rows`` synthetic rows; return one result per stage."""
+    hubspot_path, form_path = write_dataset(rows, data_dir)
+
+    # Memory pass: peak traced allocations of each stage
+    peaks = {}
+    for stage in _run_stages(hubspot_path, form_path):
+        tracemalloc.start()
+        stage()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        peaks[stage.__name__] = peak
+
+    # Timing pass, without tracing overhead
+    results = []
+    for stage in _run_stages(hubspot_path, form_path):
+        start = time.perf_counter()
+        stage()
+        seconds = time.perf_counter() - start
+        results.append({'rows': rows, 'stage': stage.__name__, 'seconds': round(seconds, 4),
+                        'peak_mb': round(peaks[stage.__name__] / 2 ** 20, 1)})
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the NPS pipeline stage by stage.')
+    parser.add_argument('--sizes', nargs='+', default=DEFAULT_SIZES, help='row counts, e.g. 10k 100k 1M')
+    parser.add_argument('--data-dir', default=OUT_DIR, help='directory for the synthetic CSVs')
+    parser.add_argument('--json', help='also write the results to this JSON file')
+    args = parser.parse_args(argv)
+
+    results = []
+    for size in args.sizes:
+        results.extend(run(parse_rows(size), args.data_dir))
+
+    print(pd.DataFrame(results).to_string(index=False))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""Synthetic ``hubspot.csv``- and ``google_form.csv``-shaped exports.
+
+Survey names, cohorts, rating distributions and free-text answers are
+sampled from the real exports, so the generated files have the same
+columns, cardinalities and value shapes at any number of rows. CSAT surveys
+(those scored out of 2 in the real data) keep their 0-2 scale. Files are
+generated and appended ``CHUNK_ROWS`` rows at a time, so a 10M-row export
+never has to fit in memory.
+
+Usage::
+
+    python -m benchmarks.synthetic --rows 100k [--out-dir benchmarks/data]
+"""
+
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from nps.loader import FORM_CSV, FORM_DATE_FORMAT, FORM_RATING, FORM_RENAMES, HUBSPOT_CSV, HUBSPOT_DATE_FORMAT
+
+OUT_DIR = Path(__file__).resolve().parent / 'data'
+
+FIRST_DATE = pd.Timestamp('2019-02-01')
+LAST_DATE = pd.Timestamp('2025-09-30')
+
+SUFFIXES = {'k': 1_000, 'm': 1_000_000}
+
+# Rows generated and written per chunk
+CHUNK_ROWS = 100_000
+
+
+def parse_rows(text):
+    """Parse a row count such as ``10k`` or ``1M``."""
+    text = str(text).strip().lower()
+    if text[-1:] in SUFFIXES:
+        return int(float(text[:-1]) * SUFFIXES[text[-1]])
+    return int(text)
+
+
+def _sample(rng, values, n, p=None):
+    return np.asarray(values, dtype=object)[rng.choice(len(values), size=n, p=p)]
+
+
+def _distribution(series):
+    counts = series.value_counts()
+    return counts.index.to_numpy(), (counts / counts.sum()).to_numpy()
+
+
+def _dates(rng, n, date_format):
+    span = (LAST_DATE - FIRST_DATE).total_seconds()
+    dates = FIRST_DATE + pd.to_timedelta(rng.random(n) * span, unit='s')
+    return pd.Series(dates).dt.strftime(date_format).to_numpy()
+
+
+def _hubspot_rows(real, n, rng, start=0):
+    # Rows start..start+n of a synthetic export sampled from the real one
+    surveys, survey_p = _distribution(real['Survey Name'])
+    csat_surveys = set(real.groupby('Survey Name')['Rating'].max().loc[lambda s: s == 2].index)
+    nps_ratings, nps_p = _distribution(real.loc[~real['Survey Name'].isin(csat_surveys), 'Rating'])
+
+    survey = _sample(rng, surveys, n, survey_p)
+    rating = _sample(rng, nps_ratings, n, nps_p).astype(int)
+    is_csat = np.isin(survey, list(csat_surveys))
+    rating[is_csat] = rng.choice([0, 1, 2], size=is_csat.sum(), p=[0.02, 0.1, 0.88])
+
+    nps_label = np.where(rating >= 9, 'Promoter', np.where(rating >= 7, 'Passive', 'Detractor'))
+    csat_label = np.array(['Negative', 'Neutral', 'Positive'], dtype=object)[np.clip(rating, 0, 2)]
+    return pd.DataFrame({
+        'Record ID': 600_000_000_000 + start + rng.permutation(n),
+        'Contact Id': rng.integers(10 ** 7, 10 ** 8, size=n),
+        'Rating': rating,
+        'Date': _dates(rng, n, HUBSPOT_DATE_FORMAT),
+        'Survey Name': survey,
+        'NPS': np.where(is_csat, None, nps_label),
+        'CSAT': np.where(is_csat, csat_label, None),
+    })
+
+
+def _form_rows(real, n, rng, start=0):
+    raw_names = {renamed: raw for raw, renamed in FORM_RENAMES.items()}
+    df = pd.DataFrame({
+        col: _sample(rng, real[col].to_numpy(), n) for col in real.columns
+    })
+
+    ratings, rating_p = _distribution(real[FORM_RATING].astype(str))
+    df[FORM_RATING] = _sample(rng, ratings, n, rating_p)
+    df[raw_names['Date']] = _dates(rng, n, FORM_DATE_FORMAT)
+    df['Form'] = 'CongratsForm' + pd.Series(np.arange(start, start + n)).astype(str)
+    df['Contact ID'] = rng.integers(10 ** 7, 10 ** 8, size=n)
+    return df
+
+
+def generate_hubspot(n, rng, template=HUBSPOT_CSV):
+    """Return ``n`` synthetic rows shaped like the HubSpot export."""
+    return _hubspot_rows(pd.read_csv(template), n, rng)
+
+
+def generate_form(n, rng, template=FORM_CSV):
+    """Return ``n`` synthetic rows shaped like the (wide, free-text) Google Form export."""
+    return _form_rows(pd.read_csv(template), n, rng)
+
+
+def _write_chunks(path, rows, n, rng, template, chunk_rows):
+    # Written under a temporary name, so an interrupted run leaves no partial file to be reused
+    real = pd.read_csv(template)
+    partial = path.with_name(path.name + '.part')
+    for start in range(0, n, chunk_rows) or [0]:
+        chunk = rows(real, min(chunk_rows, n - start), rng, start)
+        chunk.to_csv(partial, mode='a' if start else 'w', header=start == 0, index=False)
+    partial.replace(path)
+
+
+def write_dataset(rows, out_dir=OUT_DIR, seed=0, chunk_rows=CHUNK_ROWS):
+    """Write ``hubspot_<rows>.csv`` and ``google_form_<rows>.csv``; return their paths.
+
+    Each file is generated and appended ``chunk_rows`` rows at a time. Files
+    that already exist are reused.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    hubspot_path = out_dir / f'hubspot_{rows}.csv'
+    form_path = out_dir / f'google_form_{rows}.csv'
+    rng = np.random.default_rng(seed)
+    if not hubspot_path.exists():
+        _write_chunks(hubspot_path, _hubspot_rows, rows, rng, HUBSPOT_CSV, chunk_rows)
+    if not form_path.exists():
+        _write_chunks(form_path, _form_rows, rows, rng, FORM_CSV, chunk_rows)
+    return hubspot_path, form_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate synthetic survey exports.')
+    parser.add_argument('--rows', nargs='+', default=['10k'], help='row counts, e.g. 10k 100k 1M')
+    parser.add_argument('--out-dir', default=OUT_DIR, help='directory for the generated CSVs')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS, help='rows generated and written at a time')
+    args = parser.parse_args(argv)
+
+    for rows in args.rows:
+        for path in write_dataset(parse_rows(rows), args.out_dir, args.seed, args.chunk_rows):
+            print(f"Wrote {path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,6 @@
+"""Data loading and NPS/CSAT calculations shared by the dashboard pages.
+
+Import from the submodules (``nps.loader``, ``nps.metrics``, ``nps.cube``,
+``nps.report``, ...); the package itself imports nothing, so loading one
+module does not pull in the others.
+"""
@@ -0,0 +1,51 @@
+"""Write the dashboard's summary tables without starting Streamlit.
+
+Usage::
+
+    python -m nps [--out-dir nps_report] [--format csv|json|parquet]
+    python -m nps --hubspot 'exports/hubspot_*.csv' --form exports/forms/ [--workers 4]
+
+One file is written per table (e.g. ``survey_nps.csv``, ``trend_combined.csv``).
+When ``--hubspot`` or ``--form`` is a directory or glob pattern, the files are
+aggregated in parallel (``nps.ingest``); the lead-time table needs whole
+frames and is only written for single files.
+"""
+
+import argparse
+from pathlib import Path
+
+from nps.ingest import ingest_report
+from nps.loader import FORM_CSV, HUBSPOT_CSV
+from nps.report import build_report
+
+WRITERS = {
+    'csv': lambda df, path: df.to_csv(path, index=False),
+    'json': lambda df, path: df.to_json(path, orient='records', date_format='iso', indent=2),
+    'parquet': lambda df, path: df.to_parquet(path, index=False),
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Write the NPS/CSAT summary tables to files.')
+    parser.add_argument('--hubspot', default=HUBSPOT_CSV, help='HubSpot export file, directory or glob')
+    parser.add_argument('--form', default=FORM_CSV, help='Google Form export file, directory or glob')
+    parser.add_argument('--out-dir', default='nps_report', help='directory for the output files')
+    parser.add_argument('--format', choices=sorted(WRITERS), default='csv', help='output file format')
+    parser.add_argument('--workers', type=int, help='worker processes for many files (default: one per CPU)')
+    args = parser.parse_args(argv)
+
+    if Path(args.hubspot).is_file() and Path(args.form).is_file():
+        report = build_report(args.hubspot, args.form)
+    else:
+        report = ingest_report(args.hubspot, args.form, args.workers)
+
+    out_dir = Path(args.out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for name, table in report.items():
+        path = out_dir / f"{name}.{args.format}"
+        WRITERS[args.format](table, path)
+        print(f"Wrote {path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,202 @@
+"""NPS drop and detractor-spike alerts, updated one response at a time.
+
+Each NPS survey (HubSpot) and cohort (Google Form) keeps a few running
+statistics: a fast and a slow exponentially weighted mean of the response's
+NPS contribution (+100 promoter, 0 passive, -100 detractor), a slow mean of
+the detractor rate and a one-sided CUSUM of detractors above that rate. New
+responses are applied in date order with a constant amount of work each, so
+a scheduled check costs as much as the responses that arrived since the
+last one.
+
+Usage::
+
+    python -m nps.alerts [--state nps_alerts.pkl] [--sink log|file|webhook] [--target PATH_OR_URL]
+
+The first run (or ``--rebuild``) replays the whole history to set the
+baselines without emitting anything, unless ``--backfill`` is given. An
+``nps_drop`` alert fires when the fast mean falls ``DROP_POINTS`` below the
+slow one, and a ``detractor_spike`` when the CUSUM passes ``CUSUM_LIMIT``
+detractors more than expected.
+"""
+
+import argparse
+import json
+import logging
+import urllib.request
+from pathlib import Path
+
+import pandas as pd
+
+from nps.incremental import SOURCES, row_keys
+from nps.loader import DATA_DIR
+from nps.metrics import rating_scales
+
+STATE_PATH = DATA_DIR / 'nps_alerts.pkl'
+
+FAST_ALPHA = 0.1
+SLOW_ALPHA = 0.02
+DROP_POINTS = 40
+CUSUM_SLACK = 0.05
+CUSUM_LIMIT = 3.0
+# Responses a survey/cohort needs before it can alert
+MIN_RESPONSES = 20
+
+logger = logging.getLogger(__name__)
+
+
+class GroupStats:
+    """Running statistics of one survey or cohort."""
+
+    def __init__(self):
+        self.responses = 0
+        self.fast_nps = 0.0
+        self.slow_nps = 0.0
+        self.detractor_rate = 0.0
+        self.cusum = 0.0
+        self.dropped = False
+
+    def update(self, rating):
+        """Fold in one rating; return the alert kinds it triggers."""
+        score = 100.0 if rating >= 9 else -100.0 if rating < 7 else 0.0
+        detractor = float(rating < 7)
+        if self.responses == 0:
+            self.fast_nps = self.slow_nps = score
+            self.detractor_rate = detractor
+        self.responses += 1
+
+        # CUSUM against the rate seen so far, before this response moves it
+        self.cusum = max(0.0, self.cusum + detractor - self.detractor_rate - CUSUM_SLACK)
+        self.fast_nps += FAST_ALPHA * (score - self.fast_nps)
+        self.slow_nps += SLOW_ALPHA * (score - self.slow_nps)
+        self.detractor_rate += SLOW_ALPHA * (detractor - self.detractor_rate)
+
+        alerts = []
+        if self.responses < MIN_RESPONSES:
+            return alerts
+        dropped = self.fast_nps < self.slow_nps - DROP_POINTS
+        if dropped and not self.dropped:
+            alerts.append('nps_drop')
+        # Re-arm once the fast mean is back within half the threshold
+        self.dropped = dropped or (self.dropped and self.fast_nps < self.slow_nps - DROP_POINTS / 2)
+        if self.cusum > CUSUM_LIMIT:
+            alerts.append('detractor_spike')
+            self.cusum = 0.0
+        return alerts
+
+
+class AlertMonitor:
+    """Per survey/cohort statistics plus the keys of every response applied."""
+
+    def __init__(self):
+        self.groups = {}
+        self.seen = {source: pd.Index([], dtype='uint64') for source in SOURCES}
+
+    @classmethod
+    def load(cls, path=STATE_PATH):
+        """Load saved statistics, or start empty if there is no state file."""
+        try:
+            return pd.read_pickle(path)
+        except FileNotFoundError:
+            return cls()
+
+    def save(self, path=STATE_PATH):
+        pd.to_pickle(self, path)
+
+    def ingest(self, df, source, group, key):
+        """Apply the responses in ``df`` not seen before, oldest first; return their alerts.
+
+        ``df`` is the whole export: CSAT surveys (``rating_scales``) are left
+        out, as their 0-2 ratings would all count as detractors.
+        """
+        scales = rating_scales(df['Rating'], df[group])
+        csat = scales.index[scales == 'CSAT']
+        for name in csat.astype(str):
+            self.groups.pop((source, name), None)
+        df = df[~df[group].isin(csat)]
+
+        keys = row_keys(df, key)
+        new = ~pd.Index(keys).isin(self.seen[source]) & ~pd.Index(keys).duplicated()
+        self.seen[source] = self.seen[source].append(pd.Index(keys[new]))
+
+        df = df[new].dropna(subset=['Rating', 'Date', group]).sort_values('Date', kind='stable')
+        alerts = []
+        for name, rating, date in zip(df[group].astype(str), df['Rating'], df['Date']):
+            stats = self.groups.setdefault((source, name), GroupStats())
+            for kind in stats.update(rating):
+                alerts.append({
+                    'kind': kind,
+                    'source': source,
+                    'group': name,
+                    'date': date.isoformat(),
+                    'recent_nps': round(stats.fast_nps, 1),
+                    'baseline_nps': round(stats.slow_nps, 1),
+                    'baseline_detractor_rate': round(stats.detractor_rate, 3),
+                    'responses': stats.responses,
+                })
+        return alerts
+
+    def refresh(self):
+        """Apply new rows from every export; return the alerts raised."""
+        alerts = []
+        for source, (load, group, key) in SOURCES.items():
+            alerts += self.ingest(load(columns=[group, 'Rating', 'Date'] + key), source, group, key)
+        return alerts
+
+
+def log_sink(alerts, target=None):
+    for alert in alerts:
+        logger.warning("%(kind)s for %(source)s %(group)s on %(date)s: recent NPS %(recent_nps)s, "
+                       "baseline %(baseline_nps)s", alert)
+
+
+def file_sink(alerts, target):
+    with open(target, 'a') as f:
+        for alert in alerts:
+            f.write(json.dumps(alert) + '\n')
+
+
+def webhook_sink(alerts, target):
+    # One POST with every alert of the check, as JSON
+    request = urllib.request.Request(target, data=json.dumps({'alerts': alerts}).encode(),
+                                     headers={'Content-Type': 'application/json'}, method='POST')
+    with urllib.request.urlopen(request, timeout=10):
+        pass
+
+
+SINKS = {
+    'log': log_sink,
+    'file': file_sink,
+    'webhook': webhook_sink,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Check new survey responses for NPS drops and detractor spikes.')
+    parser.add_argument('--state', default=STATE_PATH, help='alert state file')
+    parser.add_argument('--sink', choices=sorted(SINKS), default='log', help='where to send alerts')
+    parser.add_argument('--target', help='file path (file sink) or URL (webhook sink)')
+    parser.add_argument('--rebuild', action='store_true', help='discard saved state and replay all history')
+    parser.add_argument('--backfill', action='store_true', help='also send alerts raised while replaying history')
+    args = parser.parse_args(argv)
+    if args.sink != 'log' and not args.target:
+        parser.error(f"--target is required for the {args.sink} sink")
+
+    logging.basicConfig(format='%(asctime)s %(levelname)s %(message)s')
+    # The class from the imported module (not __main__), so the saved state loads anywhere
+    from nps.alerts import AlertMonitor as Monitor
+
+    first_run = args.rebuild or not Path(args.state).exists()
+    monitor = Monitor() if args.rebuild else Monitor.load(args.state)
+    alerts = monitor.refresh()
+    if first_run and not args.backfill:
+        print(f"Baselines set from history ({len(alerts)} historical alerts not sent)")
+    elif alerts:
+        SINKS[args.sink](alerts, args.target)
+        print(f"Sent {len(alerts)} alerts to {args.sink}")
+    else:
+        print("No alerts")
+    monitor.save(args.state)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""Convert the HubSpot and Google Form CSV exports to typed Parquet files.
+
+Usage::
+
+    python -m nps.convert [--hubspot hubspot.csv] [--form google_form.csv]
+
+Each export is cleaned exactly as the loader cleans it (renamed columns,
+numeric ratings, datetime dates, categorical survey/cohort/label columns) and
+written next to the CSV with a ``.parquet`` suffix. The loaders pick these
+files up automatically and read only the columns a page asks for.
+"""
+
+import argparse
+from pathlib import Path
+
+import pandas as pd
+
+from nps.loader import FORM_CSV, HUBSPOT_CSV, clean_form, clean_hubspot
+
+
+def convert(csv_path, clean):
+    """Write the cleaned Parquet copy of ``csv_path`` and return its path."""
+    csv_path = Path(csv_path)
+    out_path = csv_path.with_suffix('.parquet')
+    df = clean(pd.read_csv(csv_path))
+    df.to_parquet(out_path, index=False)
+    return out_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--hubspot', default=HUBSPOT_CSV, help='HubSpot CSV export')
+    parser.add_argument('--form', default=FORM_CSV, help='Google Form CSV export')
+    args = parser.parse_args(argv)
+
+    for csv_path, clean in [(args.hubspot, clean_hubspot), (args.form, clean_form)]:
+        out_path = convert(csv_path, clean)
+        print(f"Wrote {out_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""Precomputed NPS cube.
+
+Responses are counted once into a compact table of promoter/passive/detractor
+counts indexed by source x survey/cohort x year x quarter x month. Charts,
+gauges and tables then get their NPS by summing rows of the cube, which has
+a few hundred rows however many responses there are, instead of rescanning
+the raw frames for every view.
+"""
+
+import functools
+
+import numpy as np
+import pandas as pd
+
+from nps.loader import FORM_CSV, HUBSPOT_CSV, clean_df, file_key, load_form, load_hubspot
+from nps.metrics import count_responses
+
+CUBE_KEYS = ['Source', 'Group', 'Year', 'Quarter', 'Month']
+
+SOURCE_GROUPS = {'HubSpot': 'Survey Name', 'Google Form': 'Cohort'}
+
+
+def build_cube(frames):
+    """Count responses from ``{source: frame}`` into an NPS cube.
+
+    Each frame needs ``Rating``, ``Date`` and the source's grouping column
+    (``Survey Name`` for HubSpot, ``Cohort`` for the Google Form). Rows
+    without a rating or date are left out, as in the Key Findings charts.
+    """
+    parts = []
+    for source, df in frames.items():
+        df = clean_df(df)
+        parts.append(count_responses(df, [
+            pd.Series(source, index=df.index, name='Source'),
+            df[SOURCE_GROUPS[source]].astype(object).rename('Group'),
+            df['Date'].dt.year.rename('Year'),
+            df['Date'].dt.quarter.rename('Quarter'),
+            df['Date'].dt.month.rename('Month'),
+        ]))
+    return pd.concat(parts).sort_index()
+
+
+@functools.lru_cache(maxsize=4)
+def _cached_cube(hubspot_key, form_key):
+    columns = ['Rating', 'Date']
+    return build_cube({
+        'HubSpot': load_hubspot(hubspot_key[0], columns=columns + ['Survey Name']),
+        'Google Form': load_form(form_key[0], columns=columns + ['Cohort']),
+    })
+
+
+def load_cube(hubspot_path=HUBSPOT_CSV, form_path=FORM_CSV):
+    """Return the cube for the current exports, rebuilt only when a file changes."""
+    return _cached_cube(file_key(hubspot_path), file_key(form_path))
+
+
+def cache_info():
+    """Return ``(hits, misses)`` of the cube cache."""
+    info = _cached_cube.cache_info()
+    return info.hits, info.misses
+
+
+def rollup(cube, by, sources=None, groups=None, years=None):
+    """Sum the cube's counts over ``by`` levels, optionally sliced first.
+
+    ``sources``, ``groups`` and ``years`` restrict the cube to those values
+    before summing; ``None`` keeps everything.
+    """
+    mask = np.ones(len(cube), dtype=bool)
+    for level, values in [('Source', sources), ('Group', groups), ('Year', years)]:
+        if values is not None:
+            mask &= cube.index.get_level_values(level).isin(values)
+    return cube[mask].groupby(level=by, dropna=False).sum()
+
+
+def rounded_nps(counts):
+    """NPS rounded to a whole number, as ``calculate_nps`` on the raw scores."""
+    promoters = counts['Promoters (9-10)']
+    detractors = counts['Detractors (0-6)']
+    return np.round((promoters - detractors) / counts['Responses'] * 100, 0)
@@ -0,0 +1,60 @@
+"""Report the date values in the exports that do not match their known layout.
+
+Usage::
+
+    python -m nps.dates [--hubspot hubspot.csv] [--form google_form.csv]
+
+The loaders parse every date column with an explicit format and turn values
+that do not match into NaT. This lists those values per source and column,
+with how many rows carry each one, so a change in an export's date layout is
+noticed rather than silently dropping rows.
+"""
+
+import argparse
+
+import pandas as pd
+
+from nps.loader import FORM_CSV, FORM_DATES, FORM_RENAMES, HUBSPOT_CSV, HUBSPOT_DATES, unparsed_dates
+
+
+def date_failures(df, dates):
+    """Unparsed values per date column of a raw (renamed) export frame."""
+    parts = []
+    for col, date_format in dates.items():
+        if col in df.columns:
+            failed = unparsed_dates(df[col], date_format)
+            counts = failed.value_counts()
+            parts.append(pd.DataFrame({'Column': col, 'Value': counts.index, 'Rows': counts.to_numpy()}))
+    return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=['Column', 'Value', 'Rows'])
+
+
+def date_report(hubspot_path=HUBSPOT_CSV, form_path=FORM_CSV):
+    """Return the unparsed date values of both CSV exports."""
+    tables = []
+    for source, path, renames, dates in [
+        ('HubSpot', hubspot_path, {}, HUBSPOT_DATES),
+        ('Google Form', form_path, FORM_RENAMES, FORM_DATES),
+    ]:
+        df = pd.read_csv(path, dtype=str)
+        df.columns = df.columns.str.strip()
+        failures = date_failures(df.rename(columns=renames), dates)
+        tables.append(failures.assign(Source=source))
+    report = pd.concat(tables, ignore_index=True)
+    return report[['Source', 'Column', 'Value', 'Rows']]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--hubspot', default=HUBSPOT_CSV, help='HubSpot CSV export')
+    parser.add_argument('--form', default=FORM_CSV, help='Google Form CSV export')
+    args = parser.parse_args(argv)
+
+    report = date_report(args.hubspot, args.form)
+    if len(report):
+        print(report.to_string(index=False))
+    else:
+        print("Every date value matches its format.")
+
+
+if __name__ == '__main__':
+    main()
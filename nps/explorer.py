@@ -0,0 +1,134 @@
+"""Server-side paging over the combined raw responses.
+
+The HubSpot and Google Form rows are put into one frame once per export
+version. A page request filters it with vectorized masks (a text filter
+first narrows the rows with the comment index), orders it with a sort
+permutation computed once per column and kept for later requests, and
+returns only the rows of the requested page, so the dashboard never sends
+more than one page to the browser.
+"""
+
+import functools
+import threading
+
+import numpy as np
+import pandas as pd
+
+from nps.loader import FORM_CSV, HUBSPOT_CSV, file_key, load_form, load_form_text, load_hubspot
+from nps.search import comment_index
+from nps.text import TEXT_COLUMNS, comment_responses, nps_class
+
+RESPONSE_COLUMNS = ['Source', 'Survey / Cohort', 'Date', 'Rating', 'NPS Class', 'Contact ID', 'Record ID'] + list(
+    TEXT_COLUMNS)
+
+PAGE_SIZES = [25, 50, 100, 250]
+
+
+class ResponseTable:
+    """The combined responses with cached sort orders."""
+
+    def __init__(self, df, comment_keys=None):
+        self.df = df
+        # Comment-index key of every row (0 for rows without comments), to narrow text filters
+        self.comment_keys = comment_keys
+        self._orders = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.df)
+
+    def order(self, column, ascending=True):
+        """Row positions sorted by ``column`` (missing values last), computed once."""
+        with self._lock:
+            if (column, ascending) not in self._orders:
+                values = self.df[column]
+                self._orders[column, ascending] = np.asarray(
+                    values.sort_values(ascending=ascending, kind='stable', na_position='last').index)
+            return self._orders[column, ascending]
+
+    def mask(self, sources=None, groups=None, nps_classes=None, ratings=None, start_date=None, end_date=None,
+             text=None, within=None):
+        """Boolean mask of the rows matching every given filter (``None`` = no filter).
+
+        ``within`` is a boolean mask to start from, e.g. a dashboard segment.
+        """
+        df = self.df
+        mask = np.ones(len(df), dtype=bool) if within is None else within.copy()
+        for column, values in [('Source', sources), ('Survey / Cohort', groups), ('NPS Class', nps_classes)]:
+            if values is not None:
+                mask &= df[column].isin(values).to_numpy()
+        if ratings is not None:
+            mask &= df['Rating'].between(*ratings).to_numpy(dtype=bool, na_value=False)
+        if start_date is not None:
+            mask &= (df['Date'] >= pd.Timestamp(start_date)).to_numpy()
+        if end_date is not None:
+            mask &= (df['Date'] < pd.Timestamp(end_date) + pd.Timedelta(days=1)).to_numpy()
+        if text:
+            # Substring check only on the rows still in and, when the index can tell, with a matching token
+            rows = mask
+            keys = None if self.comment_keys is None else comment_index().containing(text)
+            if keys is not None:
+                rows = rows & np.isin(self.comment_keys, keys)
+            rows = np.flatnonzero(rows)
+            found = np.zeros(len(rows), dtype=bool)
+            for question in TEXT_COLUMNS:
+                found |= df[question].iloc[rows].str.contains(text, case=False, regex=False, na=False).to_numpy()
+            mask = np.zeros(len(df), dtype=bool)
+            mask[rows[found]] = True
+        return mask
+
+    def page(self, page=0, page_size=PAGE_SIZES[0], sort_by=None, ascending=True, columns=None, mask=None,
+             **filters):
+        """Return ``(rows of the page, number of matching rows)``.
+
+        ``filters`` are the ``mask`` arguments, or pass a ``mask`` already
+        computed from them; ``columns`` selects the columns returned.
+        """
+        if mask is None:
+            mask = self.mask(**filters)
+        positions = self.order(sort_by, ascending) if sort_by is not None else np.arange(len(self.df))
+        positions = positions[mask[positions]]
+        start = page * page_size
+        rows = self.df.iloc[positions[start:start + page_size]]
+        return rows[columns] if columns is not None else rows, len(positions)
+
+
+def build_responses(df_hubspot, df_form):
+    """Stack the HubSpot and Google Form rows under ``RESPONSE_COLUMNS``."""
+    hubspot = pd.DataFrame({
+        'Source': 'HubSpot',
+        'Survey / Cohort': df_hubspot['Survey Name'].astype(object),
+        'Date': df_hubspot['Date'],
+        'Rating': df_hubspot['Rating'],
+        'Contact ID': df_hubspot['Contact Id'],
+        'Record ID': df_hubspot['Record ID'],
+    })
+    form = pd.DataFrame({
+        'Source': 'Google Form',
+        'Survey / Cohort': df_form['Cohort'].astype(object),
+        'Date': df_form['Date'],
+        'Rating': df_form['Rating'],
+        'Contact ID': df_form['Contact ID'],
+        **{question: df_form[column] for question, column in TEXT_COLUMNS.items()},
+    })
+    df = pd.concat([hubspot, form], ignore_index=True)
+    df['NPS Class'] = nps_class(df['Rating'])
+    df['Contact ID'] = df['Contact ID'].astype('Int64')
+    df['Record ID'] = df['Record ID'].astype('Int64')
+    return df[RESPONSE_COLUMNS]
+
+
+@functools.lru_cache(maxsize=2)
+def _cached_responses(hubspot_key, form_key):
+    df_hubspot = load_hubspot(hubspot_key[0], columns=['Survey Name', 'Date', 'Rating', 'Contact Id', 'Record ID'])
+    df_form = load_form(form_key[0], columns=['Cohort', 'Date', 'Rating', 'Contact ID']).join(
+        load_form_text(TEXT_COLUMNS.values(), form_key[0]))
+    # Form rows in loader order, as in the combined frame; also brings the comment index up to date
+    comment_keys = np.concatenate([np.zeros(len(df_hubspot), dtype='uint64'),
+                                   comment_responses(form_key[0])['key'].to_numpy()])
+    return ResponseTable(build_responses(df_hubspot, df_form), comment_keys)
+
+
+def load_responses(hubspot_path=HUBSPOT_CSV, form_path=FORM_CSV):
+    """Return the ``ResponseTable`` for the current exports, rebuilt only when a file changes."""
+    return _cached_responses(file_key(hubspot_path), file_key(form_path))
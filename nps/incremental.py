@@ -0,0 +1,151 @@
+"""Incremental, append-only ingestion of new survey responses.
+
+Keeps running promoter/passive/detractor counts per (source, survey/cohort,
+year, quarter, month) together with the keys of every response already counted.
+On refresh only rows that have not been seen before are aggregated and added
+to the totals, so the cost of a refresh follows the number of new responses
+rather than the full history.
+
+Usage::
+
+    python -m nps.incremental [--state nps_state.pkl] [--rebuild]
+
+Responses are identified by ``Record ID`` for HubSpot. The Google Form
+``Contact ID`` is missing for some rows and repeats when a student submits
+twice, so form rows are identified by ``Contact ID`` together with the
+submission ``Date``.
+
+The counts have the layout of the NPS cube. When the ``NPS_STATE``
+environment variable points at a saved state file, the Key Findings page
+reads its cube from that file instead of recounting the exports, so a
+scheduled ``python -m nps.incremental`` is the only step that touches them.
+"""
+
+import argparse
+import functools
+import os
+from pathlib import Path
+
+import pandas as pd
+
+from nps.cube import CUBE_KEYS
+from nps.loader import DATA_DIR, file_key, load_form, load_hubspot
+from nps.metrics import COUNT_COLUMNS, count_responses, nps_from_counts
+
+STATE_ENV = 'NPS_STATE'
+STATE_PATH = DATA_DIR / 'nps_state.pkl'
+
+COUNT_KEYS = CUBE_KEYS
+
+# Columns identifying a single response in each export
+HUBSPOT_KEY = ['Record ID']
+FORM_KEY = ['Contact ID', 'Date']
+
+# Source name -> (loader, grouping column, columns identifying a response)
+SOURCES = {
+    'HubSpot': (load_hubspot, 'Survey Name', HUBSPOT_KEY),
+    'Google Form': (load_form, 'Cohort', FORM_KEY),
+}
+
+
+def row_keys(df, key):
+    """Return a uint64 hash identifying each row by its ``key`` columns."""
+    return pd.util.hash_pandas_object(df[key], index=False).to_numpy()
+
+
+class IncrementalAggregates:
+    """Running NPS counts that only ever aggregate unseen responses."""
+
+    def __init__(self):
+        index = pd.MultiIndex.from_tuples([], names=COUNT_KEYS)
+        self.counts = pd.DataFrame(columns=COUNT_COLUMNS, index=index, dtype='int64')
+        self.seen = {source: pd.Index([], dtype='uint64') for source in SOURCES}
+
+    @classmethod
+    def load(cls, path=STATE_PATH):
+        """Load saved aggregates, or start empty if there is no state file.
+
+        State saved with other count keys (before months were counted) is
+        discarded, so the next refresh recounts all history.
+        """
+        try:
+            state = pd.read_pickle(path)
+        except FileNotFoundError:
+            return cls()
+        if list(state.counts.index.names) != COUNT_KEYS:
+            return cls()
+        return state
+
+    def save(self, path=STATE_PATH):
+        pd.to_pickle(self, path)
+
+    def ingest(self, df, source, group, key):
+        """Add the responses in ``df`` not seen before; return how many."""
+        keys = row_keys(df, key)
+        new = ~pd.Index(keys).isin(self.seen[source]) & ~pd.Index(keys).duplicated()
+        if not new.any():
+            return 0
+
+        df = df[new]
+        self.seen[source] = self.seen[source].append(pd.Index(keys[new]))
+
+        df = df.dropna(subset=['Rating', 'Date'])
+        batch = count_responses(df, [
+            pd.Series(source, index=df.index, name='Source'),
+            df[group].astype(object).rename('Group'),
+            df['Date'].dt.year.rename('Year'),
+            df['Date'].dt.quarter.rename('Quarter'),
+            df['Date'].dt.month.rename('Month'),
+        ])
+        self.counts = pd.concat([self.counts, batch]).groupby(level=COUNT_KEYS, dropna=False).sum().astype('int64')
+        return int(new.sum())
+
+    def refresh(self):
+        """Ingest new rows from every export; return new rows per source."""
+        added = {}
+        for source, (load, group, key) in SOURCES.items():
+            added[source] = self.ingest(load(columns=[group, 'Rating', 'Date'] + key), source, group, key)
+        return added
+
+    def nps_table(self, by):
+        """Sum the running counts over ``by`` levels and add the NPS."""
+        table = self.counts.groupby(level=by).sum()
+        table['NPS Score'] = nps_from_counts(table).round().astype(int)
+        return table.reset_index()
+
+
+def state_path():
+    """Return the state file named by ``NPS_STATE`` if it exists, else None."""
+    path = os.environ.get(STATE_ENV)
+    if path and Path(path).exists():
+        return Path(path)
+    return None
+
+
+@functools.lru_cache(maxsize=2)
+def _state_cube(path, mtime):
+    counts = IncrementalAggregates.load(path).counts
+    return counts.sort_index()
+
+
+def state_cube(path):
+    """Return the saved counts as an NPS cube, reloaded only when the state file changes."""
+    return _state_cube(*file_key(path))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Ingest new survey responses into the running NPS counts.')
+    parser.add_argument('--state', default=STATE_PATH, help='aggregate state file')
+    parser.add_argument('--rebuild', action='store_true', help='discard saved state and recount all history')
+    args = parser.parse_args(argv)
+
+    # Pickled as nps.incremental's class rather than __main__'s, so the pages can load the state
+    from nps.incremental import IncrementalAggregates as Aggregates
+    aggregates = Aggregates() if args.rebuild else Aggregates.load(args.state)
+    for source, added in aggregates.refresh().items():
+        print(f"{source}: {added} new responses")
+    aggregates.save(args.state)
+
+
+if __name__ == '__main__':
+    main()
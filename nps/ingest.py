@@ -0,0 +1,91 @@
+"""Parallel aggregation of exports split across many files.
+
+HubSpot and Google Form exports arrive as periodic files. Each file is read
+in chunks and folded into a ``StreamedExport`` in its own worker process;
+the workers send back only the additive aggregates (counts per group, year
+and rating, first/last dates and the NPS cube), which are merged in file
+order into the same tables the dashboard shows.
+
+Usage::
+
+    python -m nps.ingest --hubspot 'exports/hubspot_*.csv' --form exports/forms/ [--workers 4]
+
+``--hubspot`` and ``--form`` each take a file, a directory of ``.csv`` and
+``.parquet`` files or a glob pattern (quoted, so the shell leaves it alone).
+"""
+
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from nps.cube import SOURCE_GROUPS
+from nps.loader import CHUNK_SIZE, FORM_CSV, HUBSPOT_CSV, export_files, iter_form, iter_hubspot
+from nps.stream import StreamedExport, streamed_report
+
+READERS = {
+    'HubSpot': iter_hubspot,
+    'Google Form': iter_form,
+}
+
+
+def aggregate_file(source, path, chunksize=CHUNK_SIZE):
+    """Fold one export file of ``source`` into a new ``StreamedExport``."""
+    export = StreamedExport(source)
+    columns = [SOURCE_GROUPS[source], 'Rating', 'Date']
+    for chunk in READERS[source](path, columns=columns, chunksize=chunksize):
+        export.fold(chunk)
+    return export
+
+
+def ingest_exports(hubspot=HUBSPOT_CSV, form=FORM_CSV, workers=None, chunksize=CHUNK_SIZE):
+    """Aggregate every file named by ``hubspot`` and ``form`` in parallel.
+
+    Returns ``({source: StreamedExport}, cube)`` as ``stream_exports`` does.
+    ``workers`` defaults to the number of CPUs (and never exceeds the number
+    of files); with one worker the files are folded in this process.
+    """
+    tasks = [(source, path) for source, spec in [('HubSpot', hubspot), ('Google Form', form)]
+             for path in export_files(spec)]
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+
+    exports = {source: StreamedExport(source) for source in READERS}
+    if workers == 1:
+        for source, path in tasks:
+            exports[source].merge(aggregate_file(source, path, chunksize))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(aggregate_file, source, path, chunksize) for source, path in tasks]
+            # Merged in file order, so the result does not depend on which worker finishes first
+            for (source, _), future in zip(tasks, futures):
+                exports[source].merge(future.result())
+
+    cube = pd.concat([export.cube for export in exports.values()]).sort_index()
+    return exports, cube
+
+
+def ingest_report(hubspot=HUBSPOT_CSV, form=FORM_CSV, workers=None, chunksize=CHUNK_SIZE):
+    """Return the Overview tables and trend series of all the files, keyed as in ``build_report``."""
+    return streamed_report(*ingest_exports(hubspot, form, workers, chunksize))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Aggregate exports split across many files in parallel.')
+    parser.add_argument('--hubspot', default=HUBSPOT_CSV, help='HubSpot export file, directory or glob')
+    parser.add_argument('--form', default=FORM_CSV, help='Google Form export file, directory or glob')
+    parser.add_argument('--workers', type=int, help='worker processes (default: one per CPU)')
+    parser.add_argument('--chunksize', type=int, default=CHUNK_SIZE, help='rows per chunk within a file')
+    args = parser.parse_args(argv)
+
+    for source, spec in [('HubSpot', args.hubspot), ('Google Form', args.form)]:
+        print(f"{source}: {len(export_files(spec))} files")
+    exports, _ = ingest_exports(args.hubspot, args.form, args.workers, args.chunksize)
+    for source, export in exports.items():
+        print(f"{source} by {export.group}")
+        print(export.summary().to_string(index=False))
+        print()
+
+
+if __name__ == '__main__':
+    main()
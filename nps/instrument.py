@@ -0,0 +1,135 @@
+"""Opt-in per-stage timing and memory instrumentation.
+
+A ``Profiler`` records, for each named stage of a page run, the wall time,
+the process's peak resident memory afterwards (``resource.getrusage``, where
+available) and how many loader/cube cache hits and misses it caused. When
+profiling is off, ``Profiler.stage`` does nothing, so pages can stay
+instrumented permanently.
+
+Profiling is enabled with the ``NPS_PROFILE`` environment variable (or the
+``?profile=1`` query parameter in the dashboard). Set ``NPS_PROFILE_LOG`` to
+a file path to also append each page run to it as one JSON line.
+
+Stages are timed without ``tracemalloc``, which slows allocation-heavy
+stages several times over. Setting ``NPS_PROFILE_MEMORY`` as well adds the
+peak memory each stage allocated, traced with ``tracemalloc``; its timings
+are then inflated by the tracing. Tracing is process-wide, so traced stages
+of concurrent sessions take turns and one session's peak is never reset by
+another's.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from nps import cube, loader, rolling
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PROFILE_ENV = 'NPS_PROFILE'
+PROFILE_LOG_ENV = 'NPS_PROFILE_LOG'
+PROFILE_MEMORY_ENV = 'NPS_PROFILE_MEMORY'
+
+# Serializes traced stages across sessions (re-entrant for nested stages)
+_TRACE_LOCK = threading.RLock()
+
+
+def max_rss_mb():
+    """Peak resident memory of this process so far in MB, or None without ``resource``."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(peak / (2 ** 20 if sys.platform == 'darwin' else 2 ** 10), 1)
+
+
+def cache_counters():
+    """Return ``(hits, misses)`` summed over the loader, cube and daily-count caches."""
+    counters = [loader.cache_info(), cube.cache_info(), rolling.cache_info()]
+    return sum(hits for hits, _ in counters), sum(misses for _, misses in counters)
+
+
+def _flag(name):
+    return os.environ.get(name, '').lower() in ('1', 'true', 'yes')
+
+
+def profiling_enabled():
+    return _flag(PROFILE_ENV)
+
+
+class Profiler:
+    """Collects one record per named stage of a page run."""
+
+    def __init__(self, page, enabled=None, log_path=None, trace_memory=None):
+        self.page = page
+        self.enabled = profiling_enabled() if enabled is None else enabled
+        self.log_path = log_path if log_path is not None else os.environ.get(PROFILE_LOG_ENV)
+        self.trace_memory = _flag(PROFILE_MEMORY_ENV) if trace_memory is None else trace_memory
+        self.records = []
+
+    @contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield
+            return
+        if not self.trace_memory:
+            with self._record(name):
+                yield
+            return
+
+        with _TRACE_LOCK:
+            started = not tracemalloc.is_tracing()
+            if started:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            baseline, _ = tracemalloc.get_traced_memory()
+            try:
+                with self._record(name) as record:
+                    yield
+            finally:
+                _, peak = tracemalloc.get_traced_memory()
+                # Tracing slows every allocation; leave it as it was found
+                if started:
+                    tracemalloc.stop()
+                record['traced_peak_mb'] = round((peak - baseline) / 2 ** 20, 2)
+
+    @contextmanager
+    def _record(self, name):
+        hits, misses = cache_counters()
+        record = {'stage': name}
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['seconds'] = round(time.perf_counter() - start, 4)
+            new_hits, new_misses = cache_counters()
+            record.update({
+                'max_rss_mb': max_rss_mb(),
+                'cache_hits': new_hits - hits,
+                'cache_misses': new_misses - misses,
+            })
+            self.records.append(record)
+
+    def total_seconds(self):
+        return round(sum(record['seconds'] for record in self.records), 4)
+
+    def write_log(self):
+        """Append this run to the JSON-lines log, if one is configured."""
+        if not (self.enabled and self.log_path):
+            return
+        entry = {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'page': self.page,
+            'total_seconds': self.total_seconds(),
+            'stages': self.records,
+        }
+        with open(self.log_path, 'a') as f:
+            f.write(json.dumps(entry) + '\n')
@@ -0,0 +1,112 @@
+"""Respondent linkage across the HubSpot and Google Form exports.
+
+HubSpot's ``Contact Id`` and the form's ``Contact ID`` identify the same
+contact, so a student who answered both (or answered one survey several
+times) is counted once per response in the combined NPS. Both ID columns are
+hashed into one ``pd.factorize`` index in a single linear pass; per-source
+response counts per contact are then ``np.bincount`` over those codes and
+mapped back to the rows, with no pairwise join.
+
+Responses without a contact ID cannot be linked and are always kept.
+"""
+
+import numpy as np
+import pandas as pd
+
+from nps.loader import clean_df
+from nps.metrics import count_responses, nps_from_counts
+from nps.report import FIRST_YEAR
+
+# How to reduce a respondent's responses in one period to a single rating
+POLICIES = {
+    'latest': "Latest response",
+    'first': "First response",
+    'average': "Average rating",
+}
+
+
+def link_responses(df_hubspot, df_form):
+    """Scored responses of both sources with respondent linkage flags.
+
+    Columns: ``Source``, ``Group`` (survey or cohort), ``Contact ID``,
+    ``Rating``, ``Date``, ``Respondent`` (a code shared by every response of
+    the same contact, -1 if it has no ID), ``In Both Sources`` and
+    ``Repeat Respondent`` (the contact has more than one response).
+    """
+    df_hubspot, df_form = clean_df(df_hubspot), clean_df(df_form)
+    responses = pd.concat([
+        pd.DataFrame({'Source': 'HubSpot', 'Group': df_hubspot['Survey Name'].astype(object),
+                      'Contact ID': df_hubspot['Contact Id'], 'Rating': df_hubspot['Rating'],
+                      'Date': df_hubspot['Date']}),
+        pd.DataFrame({'Source': 'Google Form', 'Group': df_form['Cohort'].astype(object),
+                      'Contact ID': df_form['Contact ID'], 'Rating': df_form['Rating'],
+                      'Date': df_form['Date']}),
+    ], ignore_index=True)
+
+    codes, contacts = pd.factorize(responses['Contact ID'])
+    linked = codes >= 0
+    from_hubspot = (responses['Source'] == 'HubSpot').to_numpy()
+    hubspot_counts = np.bincount(codes[linked & from_hubspot], minlength=len(contacts))
+    form_counts = np.bincount(codes[linked & ~from_hubspot], minlength=len(contacts))
+
+    row_codes = np.where(linked, codes, 0)
+    responses['Respondent'] = codes
+    responses['In Both Sources'] = linked & (hubspot_counts[row_codes] > 0) & (form_counts[row_codes] > 0)
+    responses['Repeat Respondent'] = linked & ((hubspot_counts + form_counts)[row_codes] > 1)
+    return responses
+
+
+def linkage_summary(responses):
+    """One-row overview of how many responses and respondents are linked."""
+    linked = responses[responses['Respondent'] >= 0]
+    respondents = linked.drop_duplicates('Respondent')
+    return pd.DataFrame({
+        'Responses': [len(responses)],
+        'Without Contact ID': [len(responses) - len(linked)],
+        'Respondents': [len(respondents)],
+        'In Both Sources': [int(respondents['In Both Sources'].sum())],
+        'Repeat Respondents': [int(respondents['Repeat Respondent'].sum())],
+        'Duplicate Responses': [len(linked) - len(respondents)],
+    })
+
+
+def dedupe_responses(responses, policy, by=()):
+    """Keep one response per respondent within each ``by`` period.
+
+    ``policy`` is one of ``POLICIES``: ``'latest'``/``'first'`` keep the
+    latest/first response by date; ``'average'`` replaces them by their mean
+    rating, dated at the latest one.
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown deduplication policy: {policy!r}")
+    by = list(by)
+    linked = responses['Respondent'] >= 0
+    unlinked, linked = responses[~linked], responses[linked].sort_values('Date', kind='stable')
+    keys = ['Respondent'] + by
+
+    if policy == 'average':
+        grouped = linked.groupby(keys, sort=False)
+        kept = grouped.tail(1).assign(Rating=grouped['Rating'].transform('mean'))
+    elif policy == 'latest':
+        kept = linked.groupby(keys, sort=False).tail(1)
+    else:
+        kept = linked.groupby(keys, sort=False).head(1)
+    return pd.concat([unlinked, kept]).sort_index()
+
+
+def deduplicated_yearly_nps(responses, policy=None, exclude_surveys=()):
+    """Combined NPS by year, counting each respondent at most once per year.
+
+    Applies the ``yearly_nps`` filters (CSAT surveys in ``exclude_surveys``
+    dropped, ratings 0-10, years from ``FIRST_YEAR``). ``policy=None`` keeps
+    every response, which gives the plain combined table.
+    """
+    df = responses[~(responses['Source'].eq('HubSpot') & responses['Group'].isin(exclude_surveys))]
+    df = df.assign(Year=df['Date'].dt.year.astype(int))
+    df = df[(df['Year'] >= FIRST_YEAR) & (df['Rating'] >= 0) & (df['Rating'] <= 10)]
+    if policy is not None:
+        df = dedupe_responses(df, policy, by=['Year'])
+
+    counts = count_responses(df, 'Year')
+    table = counts.assign(**{'NPS Score': nps_from_counts(counts).round().astype(int)})
+    return table.reset_index()
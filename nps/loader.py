@@ -0,0 +1,288 @@
+"""Cached loaders for the HubSpot and Google Form exports.
+
+The columns the pages aggregate (IDs, survey/cohort, rating and dates) are
+read, cleaned and type-coerced once per file version into one narrow frame
+per export, and a column subset is a projection of it. Any other column is
+read from the file only when a caller asks for it; the free-text answers
+have their own lazily filled cache (``load_form_text``), so they are never
+parsed for the tables and charts. The caches are keyed on the
+resolved path and the file's modification time, so a re-exported CSV is
+picked up on the next call without restarting the server, while every
+Streamlit session and widget rerun in between shares the same parsed frames.
+
+The returned frames are shared between callers: treat them as read-only and
+derive new frames (``assign``, filtering, ``rename``) instead of mutating them.
+"""
+
+import functools
+import glob
+import os
+from pathlib import Path
+
+import pandas as pd
+
+DATA_DIR = Path(__file__).resolve().parent.parent
+HUBSPOT_CSV = DATA_DIR / 'hubspot.csv'
+FORM_CSV = DATA_DIR / 'google_form.csv'
+
+# Timestamp layouts used by each export
+HUBSPOT_DATE_FORMAT = '%Y-%m-%d %H:%M'
+FORM_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+# Day-first dates typed into the Google Form
+FORM_DAY_FORMAT = '%d/%m/%Y'
+
+FORM_RATING = 'How likely are you to recommend the Makers Academy Careers Team to future cohorts?'
+
+# Google Form columns are renamed to the names used by the HubSpot export
+FORM_RENAMES = {
+    FORM_RATING: 'Rating',
+    'Conversion Date': 'Date',
+    "What's your cohort?": 'Cohort',
+    'Date you first got a job offer, coming out of Makers Academy': 'Offer Date',
+    'Date you accepted this job offer': 'Accept Date',
+    "Date you start this job you've accepted": 'Start Date',
+}
+
+# Date columns of each export (after renaming) and their layouts
+HUBSPOT_DATES = {'Date': HUBSPOT_DATE_FORMAT}
+FORM_DATES = {
+    'Date': FORM_DATE_FORMAT,
+    'Offer Date': FORM_DAY_FORMAT,
+    'Accept Date': FORM_DAY_FORMAT,
+    'Start Date': FORM_DAY_FORMAT,
+}
+
+
+# Rows per chunk when streaming an export
+CHUNK_SIZE = 100_000
+
+# Columns of the shared narrow frame of each export (after renaming)
+HUBSPOT_NARROW_COLUMNS = ['Record ID', 'Contact Id', 'Survey Name', 'Rating', 'Date']
+FORM_NARROW_COLUMNS = ['Contact ID', 'Cohort', 'Rating', 'Date', 'Offer Date', 'Accept Date', 'Start Date']
+
+# Low-cardinality text columns stored as categoricals
+HUBSPOT_CATEGORIES = ['Survey Name', 'NPS', 'CSAT']
+FORM_CATEGORIES = ['Cohort', 'NPS']
+
+
+def source_path(path):
+    """Return the file to read for an export: its Parquet copy when present.
+
+    The Parquet file written by ``python -m nps.convert`` sits next to the CSV
+    and is only used while it is at least as new as the CSV, so a fresh CSV
+    export is never shadowed by a stale conversion.
+    """
+    path = Path(path)
+    parquet = path.with_suffix('.parquet')
+    if parquet != path and parquet.exists():
+        if not path.exists() or parquet.stat().st_mtime_ns >= path.stat().st_mtime_ns:
+            return parquet
+    return path
+
+
+def export_files(spec):
+    """Expand an export file, directory or glob pattern into the export files it names.
+
+    A directory stands for every ``.csv`` and ``.parquet`` file in it. A CSV
+    and its Parquet copy count once, as the CSV (reading it picks the copy).
+    """
+    path = Path(spec)
+    if path.is_file():
+        return [path]
+    if path.is_dir():
+        paths = [child for child in path.iterdir() if child.suffix in ('.csv', '.parquet')]
+    else:
+        paths = [Path(match) for match in glob.glob(str(spec), recursive=True)]
+    files = {
+        candidate.with_suffix('.csv') if candidate.suffix == '.parquet' and candidate.with_suffix(
+            '.csv').exists() else candidate
+        for candidate in paths if candidate.is_file()
+    }
+    if not files:
+        raise FileNotFoundError(f"No export files match {spec}")
+    return sorted(files)
+
+
+def file_key(path):
+    """Return ``(resolved path, mtime)`` of the file an export is read from."""
+    path = os.path.abspath(source_path(path))
+    return path, os.stat(path).st_mtime_ns
+
+
+def parse_dates(values, date_format):
+    """Parse a column of date strings with a known ``date_format``.
+
+    Exports repeat the same timestamps many times, so each distinct string is
+    parsed once and the results are mapped back to the rows. Values that do
+    not match the format become NaT.
+    """
+    codes, uniques = pd.factorize(values)
+    parsed = pd.to_datetime(uniques, format=date_format, errors='coerce')
+    dates = parsed.take(codes, allow_fill=True, fill_value=pd.NaT)
+    return pd.Series(dates, index=values.index, name=values.name)
+
+
+def unparsed_dates(values, date_format):
+    """Return the non-empty values of ``values`` that ``date_format`` cannot parse."""
+    values = values.dropna()
+    return values[parse_dates(values, date_format).isna().to_numpy()]
+
+
+def compact_ratings(values):
+    """Coerce ratings to numbers stored in one byte each where possible.
+
+    Whole-number ratings become ``int8``, or the nullable ``Int8`` when some
+    are missing (e.g. ``*redacted*``); anything else stays ``float64``.
+    """
+    ratings = pd.to_numeric(values, errors='coerce')
+    scored = ratings.dropna()
+    if len(scored) and not (scored.between(-128, 127) & (scored % 1 == 0)).all():
+        return ratings
+    return ratings.astype('Int8' if ratings.hasnans else 'int8')
+
+
+def _clean(df, renames, categories, dates):
+    df.columns = df.columns.str.strip()
+    df = df.rename(columns=renames)
+    if 'Rating' in df.columns:
+        df['Rating'] = compact_ratings(df['Rating'])
+    for col, date_format in dates.items():
+        if col in df.columns:
+            df[col] = parse_dates(df[col], date_format)
+    for col in categories:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    return df
+
+
+def clean_hubspot(df):
+    """Strip headers and coerce a raw HubSpot frame to the loader schema."""
+    return _clean(df, {}, HUBSPOT_CATEGORIES, HUBSPOT_DATES)
+
+
+def clean_form(df):
+    """Strip, rename and coerce a raw Google Form frame to the loader schema."""
+    return _clean(df, FORM_RENAMES, FORM_CATEGORIES, FORM_DATES)
+
+
+def _usecols(columns, renames):
+    if columns is None:
+        return None
+    # Select by the cleaned column name so callers never see raw headers
+    return lambda col: renames.get(col.strip(), col.strip()) in columns
+
+
+def _read(path, columns, clean, renames):
+    if path.endswith('.parquet'):
+        if columns is not None:
+            import pyarrow.parquet as pq
+
+            # As with usecols on a CSV, columns the file lacks are skipped
+            names = set(pq.read_schema(path).names)
+            columns = [col for col in columns if col in names]
+        return pd.read_parquet(path, columns=columns)
+    return clean(pd.read_csv(path, usecols=_usecols(columns, renames)))
+
+
+def _read_chunks(path, columns, clean, renames, chunksize):
+    path = str(source_path(path))
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+    else:
+        for chunk in pd.read_csv(path, usecols=_usecols(columns, renames), chunksize=chunksize):
+            yield clean(chunk)
+
+
+@functools.lru_cache(maxsize=2)
+def _read_hubspot(path, mtime):
+    return _read(path, HUBSPOT_NARROW_COLUMNS, clean_hubspot, {})
+
+
+@functools.lru_cache(maxsize=2)
+def _read_form(path, mtime):
+    return _read(path, FORM_NARROW_COLUMNS, clean_form, FORM_RENAMES)
+
+
+@functools.lru_cache(maxsize=2)
+def _read_form_text(path, mtime, columns):
+    return _read(path, list(columns), clean_form, FORM_RENAMES)
+
+
+def _select(key, columns, narrow, read_narrow, clean, renames):
+    # A subset of the narrow columns is a projection of the cached frame, not another parse
+    columns = list(dict.fromkeys(columns))
+    df = read_narrow(*key)
+    df = df[[col for col in columns if col in df.columns]]
+    extra = [col for col in columns if col not in narrow]
+    if extra:
+        df = pd.concat([df, _read(key[0], extra, clean, renames)], axis=1)
+        df = df[[col for col in columns if col in df.columns]]
+    return df
+
+
+def load_hubspot(path=HUBSPOT_CSV, columns=None):
+    """Return the HubSpot export with ``int8`` ``Rating`` and datetime ``Date``.
+
+    ``columns`` selects columns (absent ones are skipped): those in
+    ``HUBSPOT_NARROW_COLUMNS`` come from the cached narrow frame, others
+    are read from the file on every call. ``None`` reads the whole export,
+    uncached. The Parquet copy of the export is used when one is available.
+    """
+    key = file_key(path)
+    if columns is None:
+        return _read(key[0], None, clean_hubspot, {})
+    return _select(key, columns, HUBSPOT_NARROW_COLUMNS, _read_hubspot, clean_hubspot, {})
+
+
+def load_form(path=FORM_CSV, columns=None):
+    """Return the Google Form export renamed to ``Rating``/``Date``/``Cohort``.
+
+    Non-numeric ratings (e.g. ``*redacted*``) become missing. ``columns``
+    uses the renamed column names and is read as by ``load_hubspot``, with
+    ``FORM_NARROW_COLUMNS`` as the narrow frame; see ``load_form_text``
+    for the free-text answers.
+    """
+    key = file_key(path)
+    if columns is None:
+        return _read(key[0], None, clean_form, FORM_RENAMES)
+    return _select(key, columns, FORM_NARROW_COLUMNS, _read_form, clean_form, FORM_RENAMES)
+
+
+def load_form_text(columns, path=FORM_CSV):
+    """Return the free-text answer ``columns`` of the Google Form export.
+
+    They are read when a text feature (comment themes, search, the response
+    explorer) first asks for them and then cached per file version, apart
+    from the narrow frame, so the tables and charts never parse them. Rows
+    line up with ``load_form``.
+    """
+    return _read_form_text(*file_key(path), tuple(columns))
+
+
+def iter_hubspot(path=HUBSPOT_CSV, columns=None, chunksize=CHUNK_SIZE):
+    """Yield the HubSpot export as cleaned frames of at most ``chunksize`` rows.
+
+    Chunks are not cached; use this when the export is too large to hold in
+    memory at once.
+    """
+    return _read_chunks(path, columns, clean_hubspot, {}, chunksize)
+
+
+def iter_form(path=FORM_CSV, columns=None, chunksize=CHUNK_SIZE):
+    """Yield the Google Form export as cleaned frames of at most ``chunksize`` rows."""
+    return _read_chunks(path, columns, clean_form, FORM_RENAMES, chunksize)
+
+
+def clean_df(df):
+    """Keep rows with a rating and a date, with dates normalized to midnight."""
+    df = df.assign(Date=df['Date'].dt.normalize())
+    return df.dropna(subset=['Rating', 'Date'])
+
+
+def cache_info():
+    """Return ``(hits, misses)`` summed over the loader caches."""
+    infos = [cache.cache_info() for cache in (_read_hubspot, _read_form, _read_form_text)]
+    return sum(info.hits for info in infos), sum(info.misses for info in infos)
@@ -0,0 +1,236 @@
+"""Vectorized NPS/CSAT aggregation.
+
+Every statistic shown in the per-survey, per-cohort and per-year tables is
+derived from one grouped pass over the frame: a ``groupby().agg`` for response
+counts and first/last dates, plus a table of bucket counts (responses per group
+per distinct score). Min, max, mean, median, mode and the promoter/passive/
+detractor split are then read off the bucket counts with NumPy, so the cost no
+longer grows with the number of groups.
+"""
+
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+NPS_COLUMNS = ['Promoters (9-10)', 'Passives (7-8)', 'Detractors (0-6)', 'NPS Score']
+
+_ALL = '_all'
+
+
+def _int_if_whole(values):
+    # Matches the old tables: integer columns unless a group had no scores
+    values = pd.Series(values)
+    return values.astype('int64') if values.notna().all() else values
+
+
+def _group_keys(df, by):
+    keys = [by] if isinstance(by, str) else list(by or [])
+    grouper = [df[k] for k in keys] or [pd.Series(0, index=df.index, name=_ALL)]
+    return keys, grouper
+
+
+def score_buckets(df, by=None, score='Rating'):
+    """Return a groups x distinct-scores table of response counts.
+
+    Rows with a missing score are not counted. With ``by=None`` the whole frame
+    is a single group.
+    """
+    _, grouper = _group_keys(df, by)
+    counts = df.groupby(grouper + [df[score]], observed=True).size()
+    return counts.unstack(score, fill_value=0).sort_index(axis=1)
+
+
+def summarise_scores(df, by=None, score='Rating', date='Date'):
+    """Per-group response statistics and NPS in a single grouped pass.
+
+    Produces the columns of the "Initial Data Analysis by Survey" table:
+    ``Number of Responses`` (all rows, including those without a score),
+    first/last ``date``, min/max/mean/mode/median of ``score`` and the
+    promoter/passive/detractor counts with the (truncated) NPS. With
+    ``by=None`` a single summary row is returned without a key column.
+    """
+    return summarise_buckets(group_stats(df, by, score, date), score_buckets(df, by, score))
+
+
+def group_stats(df, by=None, score='Rating', date='Date'):
+    """Return ``Number of Responses`` and first/last ``date`` per group."""
+    _, grouper = _group_keys(df, by)
+    return df.groupby(grouper, observed=True).agg(**{
+        'Number of Responses': (score, 'size'),
+        'First Appearance': (date, 'min'),
+        'Last Appearance': (date, 'max'),
+    })
+
+
+def summarise_buckets(stats, buckets):
+    """Build the ``summarise_scores`` table from its two partial aggregates.
+
+    ``stats`` comes from ``group_stats`` and ``buckets`` from
+    ``score_buckets``. Both can be merged across batches of rows (sum the
+    counts, min/max the dates), so the table can be built without holding
+    every row in memory at once.
+    """
+    buckets = buckets.reindex(stats.index, fill_value=0)
+    values = buckets.columns.to_numpy(dtype=float)
+    counts = buckets.to_numpy()
+    n_scored = counts.sum(axis=1)
+    has_scores = n_scored > 0
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if values.size:
+            min_score = values[(counts > 0).argmax(axis=1)]
+            max_score = values[values.size - 1 - (counts[:, ::-1] > 0).argmax(axis=1)]
+            # First maximum is the smallest most-common score, as Series.mode().iloc[0]
+            mode_score = values[counts.argmax(axis=1)]
+            cumulative = counts.cumsum(axis=1)
+            lower = (cumulative > ((n_scored - 1) // 2)[:, None]).argmax(axis=1)
+            upper = (cumulative > (n_scored // 2)[:, None]).argmax(axis=1)
+            median_score = (values[lower] + values[upper]) / 2
+            mean_score = (counts @ values) / n_scored
+        else:
+            min_score = max_score = mode_score = median_score = mean_score = np.full(len(counts), np.nan)
+
+        promoters = counts[:, values >= 9].sum(axis=1)
+        passives = counts[:, (values >= 7) & (values < 9)].sum(axis=1)
+        detractors = counts[:, values < 7].sum(axis=1)
+
+        responses = stats['Number of Responses'].to_numpy()
+        nps_score = np.trunc(((promoters / responses) - (detractors / responses)) * 100)
+
+    missing = np.where(has_scores, 1.0, np.nan)
+    summary = pd.DataFrame({
+        'Number of Responses': responses,
+        'First Appearance': stats['First Appearance'].to_numpy(),
+        'Last Appearance': stats['Last Appearance'].to_numpy(),
+        'Min Score': _int_if_whole(np.trunc(min_score * missing)),
+        'Max Score': _int_if_whole(np.trunc(max_score * missing)),
+        'Mean': np.round(mean_score * missing, 2),
+        'Mode': _int_if_whole(np.trunc(mode_score * missing)),
+        'Median': _int_if_whole(np.trunc(median_score * missing)),
+        'Promoters (9-10)': promoters,
+        'Passives (7-8)': passives,
+        'Detractors (0-6)': detractors,
+        'NPS Score': nps_score.astype('int64'),
+    })
+
+    if stats.index.names != [_ALL]:
+        index = stats.index.to_frame(index=False)
+        for col in index.columns:
+            # Report group labels with their plain dtype rather than as categoricals
+            if isinstance(index[col].dtype, pd.CategoricalDtype):
+                index[col] = index[col].astype(index[col].cat.categories.dtype)
+        summary = pd.concat([index, summary], axis=1)
+    return summary
+
+
+def _scales(top):
+    # Groups without any rating have a missing top rating; those are NPS
+    is_csat = (top == 2).to_numpy(dtype=bool, na_value=False)
+    return pd.Series(np.where(is_csat, 'CSAT', 'NPS'), index=top.index, name='Scale')
+
+
+def rating_scales(ratings, groups):
+    """Rating scale of each group: ``CSAT`` when its highest rating is 2, else ``NPS``."""
+    return _scales(pd.to_numeric(ratings, errors='coerce').groupby(groups, observed=True).max())
+
+
+def bucket_scales(buckets):
+    """``rating_scales`` from a ``score_buckets`` table of rating counts per group.
+
+    For the streaming and SQL paths, which only keep the counts.
+    """
+    present = buckets > 0
+    return _scales(present.where(present).mul(buckets.columns.to_numpy(dtype=float), axis=1).max(axis=1))
+
+
+def summarise_csat(summary, buckets, by):
+    """Turn ``summarise_scores`` rows for CSAT surveys into the CSAT table.
+
+    Adds ``Positive (2)`` and ``CSAT Score`` (share of all responses scoring
+    2), taking the positives from the ``score_buckets`` table of the same
+    frame, and drops the NPS columns.
+    """
+    positives = buckets[2] if 2 in buckets.columns else pd.Series(0, index=buckets.index)
+
+    df_csat = summary.drop(columns=NPS_COLUMNS)
+    df_csat['Positive (2)'] = df_csat[by].map(positives).fillna(0).astype(float)
+    csat = np.round(df_csat['Positive (2)'] / df_csat['Number of Responses'] * 100)
+    df_csat['CSAT Score'] = csat.astype(int).astype(str) + '%'
+    return df_csat
+
+
+def summarise_nps(df, by, score='Rating'):
+    """Responses, promoter/passive/detractor counts and NPS per group.
+
+    Used for the yearly breakdowns, where rows without a score have already
+    been dropped.
+    """
+    summary = summarise_scores(df, by, score)
+    keys, _ = _group_keys(df, by)
+    summary = summary[keys + ['Number of Responses'] + NPS_COLUMNS]
+    return summary.rename(columns={'Number of Responses': 'Responses'})
+
+
+COUNT_COLUMNS = ['Responses', 'Promoters (9-10)', 'Passives (7-8)', 'Detractors (0-6)']
+
+
+def count_responses(df, by, score='Rating'):
+    """Scored responses and promoter/passive/detractor counts per group.
+
+    ``by`` may mix column names and Series (e.g. ``df['Date'].dt.year``).
+    Counts add up across batches of rows, so tables built separately can be
+    merged with ``DataFrame.add`` and the NPS recomputed from the totals.
+    """
+    scores = df[score]
+    flags = pd.DataFrame({
+        'Responses': scores.notna(),
+        'Promoters (9-10)': scores >= 9,
+        'Passives (7-8)': (scores >= 7) & (scores < 9),
+        'Detractors (0-6)': scores < 7,
+    }).fillna(False).astype('int64')
+    by = [by] if isinstance(by, (str, pd.Series)) else list(by)
+    grouper = [df[k] if isinstance(k, str) else k for k in by]
+    return flags.groupby(grouper, observed=True, dropna=False).sum()
+
+
+def nps_from_counts(counts):
+    """Unrounded NPS for each row of a ``count_responses`` table."""
+    responses = counts['Responses']
+    return (counts['Promoters (9-10)'] / responses - counts['Detractors (0-6)'] / responses) * 100
+
+
+def nps_intervals(counts, level=0.95, method='bootstrap', resamples=2000, seed=0):
+    """Confidence interval of the NPS for every row of a counts table.
+
+    ``counts`` has the ``count_responses`` columns. With ``method='bootstrap'``
+    every row's promoter/passive/detractor counts are resampled ``resamples``
+    times in a single batched multinomial draw covering all rows at once;
+    ``method='analytic'`` uses the multinomial variance of the promoter minus
+    detractor share instead. Returns ``NPS Low``/``NPS High`` in NPS points,
+    aligned with ``counts``.
+    """
+    responses = counts['Responses'].to_numpy()
+    buckets = counts[['Promoters (9-10)', 'Passives (7-8)', 'Detractors (0-6)']].to_numpy()
+    n = np.maximum(responses, 1)
+    shares = buckets / n[:, None]
+    tail = (1 - level) / 2
+
+    if method == 'analytic':
+        z = NormalDist().inv_cdf(1 - tail)
+        nps = shares[:, 0] - shares[:, 2]
+        error = z * np.sqrt((shares[:, 0] + shares[:, 2] - nps ** 2) / n)
+        low, high = (nps - error) * 100, (nps + error) * 100
+    elif method == 'bootstrap':
+        rng = np.random.default_rng(seed)
+        draws = rng.multinomial(responses[:, None], shares[:, None, :], size=(len(responses), resamples))
+        samples = (draws[..., 0] - draws[..., 2]) / n[:, None] * 100
+        low, high = np.percentile(samples, [tail * 100, (1 - tail) * 100], axis=1)
+    else:
+        raise ValueError(f"Unknown interval method: {method!r}")
+
+    empty = responses == 0
+    return pd.DataFrame({
+        'NPS Low': np.where(empty, np.nan, np.clip(low, -100, 100)).round(1),
+        'NPS High': np.where(empty, np.nan, np.clip(high, -100, 100)).round(1),
+    }, index=counts.index)
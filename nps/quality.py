@@ -0,0 +1,187 @@
+"""Vectorized data-quality checks and rating-scale detection of the exports.
+
+Usage::
+
+    python -m nps.quality [--hubspot hubspot.csv] [--form google_form.csv]
+
+Each survey (HubSpot) or cohort (Google Form) is given a rating scale from
+its ratings: surveys whose highest rating is 2 are CSAT surveys, everything
+else is NPS. Every row the loaders return (from the Parquet copy when there
+is one) is then checked in one vectorized pass and given the first reason it
+fails, if any: a missing or non-numeric rating, a fractional rating or one
+outside the group's scale, a missing or unparsed date, or no survey/cohort.
+Rows without a survey/cohort still count in the overall and yearly tables,
+only not per survey/cohort.
+
+The loaders turn bad values into NaN/NaT quietly; this counts them per
+reason and source so they are noticed. Only telling a non-numeric rating
+from an empty one needs the exported strings, so for a CSV export the
+rating column alone is read again as text; a Parquet copy holds coerced
+values, and its non-numeric ratings count as missing. ``python -m
+nps.dates`` lists the date values that did not parse.
+"""
+
+import argparse
+import functools
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from nps.loader import FORM_CSV, FORM_RENAMES, HUBSPOT_CSV, file_key, load_form, load_hubspot
+from nps.metrics import rating_scales
+from nps.store import TABLES
+
+# Valid ratings (inclusive) per scale; CSAT exports also use 0 for an unhappy answer
+SCALES = {
+    'NPS': (0, 10),
+    'CSAT': (0, 2),
+}
+
+# In the order they are checked: a row is counted under the first that applies
+REJECT_REASONS = [
+    'missing_rating',
+    'unparseable_rating',
+    'fractional_rating',
+    'out_of_scale',
+    'missing_date',
+    'missing_group',
+]
+
+# Source -> (loader, survey/cohort column, header renames)
+SOURCES = {
+    'HubSpot': (load_hubspot, 'Survey Name', {}),
+    'Google Form': (load_form, 'Cohort', FORM_RENAMES),
+}
+
+
+def validate(df, group, raw_ratings=None):
+    """Check every row of a loaded export frame with ``group``, ``Rating`` and ``Date``.
+
+    Returns a frame aligned with ``df`` with the row's ``Scale`` and the
+    first failed check as ``Reason`` (missing for valid rows). With the
+    exported ``raw_ratings`` strings (aligned with ``df``) a non-numeric
+    rating is told apart from an empty one; without them both are missing.
+    """
+    groups = df[group].astype(object)
+    ratings = df['Rating'].astype('float64')
+    scale = groups.map(rating_scales(ratings, groups)).fillna('NPS')
+    low = scale.map({name: bounds[0] for name, bounds in SCALES.items()})
+    high = scale.map({name: bounds[1] for name, bounds in SCALES.items()})
+    if raw_ratings is not None:
+        raw_ratings = raw_ratings.str.strip()
+        blank = raw_ratings.isna() | (raw_ratings == '')
+    else:
+        blank = ratings.isna()
+
+    checks = [
+        blank,
+        ratings.isna(),
+        ratings % 1 != 0,
+        (ratings < low) | (ratings > high),
+        df['Date'].isna(),
+        groups.isna(),
+    ]
+    reason = np.select([check.to_numpy(dtype=bool, na_value=False) for check in checks], REJECT_REASONS,
+                       default=None)
+    return pd.DataFrame({'Scale': scale, 'Reason': reason}, index=df.index)
+
+
+def _raw_ratings(path, renames):
+    # The ratings as exported, so that e.g. '*redacted*' is seen rather than coerced; a Parquet copy has none
+    if not path.endswith('.csv'):
+        return None
+    raw = pd.read_csv(path, dtype=str, usecols=lambda col: renames.get(col.strip(), col.strip()) == 'Rating')
+    return raw.iloc[:, 0]
+
+
+def _tables(frames):
+    # frames: source -> (loaded rows, exported rating strings or None); a ``Rows`` column weights each row
+    rejects, scales, totals = [], [], []
+    for source, (df, raw_ratings) in frames.items():
+        group = SOURCES[source][1]
+        checked = validate(df, group, raw_ratings)
+        rows = df['Rows'] if 'Rows' in df else pd.Series(1, index=df.index)
+        rejected = rows.where(checked['Reason'].notna(), 0)
+
+        reasons = rows.groupby(checked['Reason']).sum().reindex(REJECT_REASONS, fill_value=0)
+        rejects.append(pd.DataFrame({'Source': source, 'Reason': REJECT_REASONS, 'Rows': reasons.to_numpy()}))
+
+        by_group = pd.DataFrame({'Scale': checked['Scale'], 'Rows': rows, 'Rejected': rejected}).groupby(
+            df[group].astype(object)).agg(Scale=('Scale', 'first'), Rows=('Rows', 'sum'), Rejected=('Rejected', 'sum'))
+        scales.append(by_group.rename_axis('Survey / Cohort').reset_index().assign(Source=source))
+
+        totals.append({'Source': source, 'Rows': int(rows.sum()), 'Valid': int(rows.sum() - rejected.sum()),
+                       'Rejected': int(rejected.sum())})
+
+    rejects = pd.concat(rejects, ignore_index=True)
+    scales = pd.concat(scales, ignore_index=True)
+    return {
+        'totals': pd.DataFrame(totals),
+        'rejects': rejects[rejects['Rows'] > 0].reset_index(drop=True),
+        'scales': scales[['Source', 'Survey / Cohort', 'Scale', 'Rows', 'Rejected']],
+    }
+
+
+@functools.lru_cache(maxsize=2)
+def _cached_report(hubspot_key, form_key):
+    frames = {}
+    for source, (path, _) in zip(SOURCES, [hubspot_key, form_key]):
+        load, group, renames = SOURCES[source]
+        frames[source] = load(path, columns=[group, 'Rating', 'Date']), _raw_ratings(path, renames)
+    return _tables(frames)
+
+
+@functools.lru_cache(maxsize=2)
+def _cached_store_report(path, mtime):
+    # One row per group, rating and missing date or not, with its number of stored rows
+    frames = {}
+    with sqlite3.connect(path) as conn:
+        for source, (table, group, _) in TABLES.items():
+            frames[source] = pd.read_sql_query(
+                f"""SELECT {group} AS "{SOURCES[source][1]}", rating AS Rating, MIN(date) AS Date, COUNT(*) AS Rows
+                    FROM {table} GROUP BY {group}, rating, date IS NULL""", conn), None
+    return _tables(frames)
+
+
+def quality_report(hubspot_path=HUBSPOT_CSV, form_path=FORM_CSV):
+    """Return the data-quality tables of both exports, recomputed only when a file changes.
+
+    ``totals`` has valid and rejected rows per source, ``rejects`` the
+    rejected rows per source and reason, and ``scales`` the detected scale
+    and rejects of every survey/cohort.
+    """
+    return _cached_report(file_key(hubspot_path), file_key(form_path))
+
+
+def store_quality_report(db_path):
+    """Return the ``quality_report`` tables of the rows in an ``NPS_DB`` store.
+
+    The rows are counted per survey/cohort, rating and missing date in SQL
+    and only those counts are checked. The store holds coerced ratings, so
+    non-numeric ones count as missing.
+    """
+    return _cached_store_report(*file_key(db_path))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Report rejected rows and rating scales of the exports.')
+    parser.add_argument('--hubspot', default=HUBSPOT_CSV, help='HubSpot CSV export')
+    parser.add_argument('--form', default=FORM_CSV, help='Google Form CSV export')
+    args = parser.parse_args(argv)
+
+    report = quality_report(args.hubspot, args.form)
+    print(report['totals'].to_string(index=False))
+    print()
+    if len(report['rejects']):
+        print(report['rejects'].to_string(index=False))
+    else:
+        print("No rejected rows.")
+    print()
+    csat = report['scales'][report['scales']['Scale'] == 'CSAT']
+    print(f"CSAT surveys ({len(csat)}):")
+    print(csat.to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+"""The dashboard's summary tables and trend series as pure functions.
+
+Everything the Overview and Key Findings pages display is built here from
+loaded frames (or the NPS cube), without importing Streamlit or any charting
+library, so the same numbers can be produced by the pages, by
+``python -m nps`` or by a batch job.
+"""
+
+import pandas as pd
+
+from nps.cube import load_cube, rollup, rounded_nps
+from nps.loader import FORM_CSV, FORM_DATE_FORMAT, HUBSPOT_CSV, HUBSPOT_DATE_FORMAT, load_form, load_hubspot
+from nps.metrics import (COUNT_COLUMNS, nps_intervals, rating_scales, score_buckets, summarise_csat, summarise_nps,
+                         summarise_scores)
+
+# Trend chart data-source options -> cube sources (None = all)
+DATA_SOURCES = {
+    "Combined": None,
+    "HubSpot Only": ['HubSpot'],
+    "Forms Only": ['Google Form'],
+}
+
+FIRST_YEAR = 2019
+
+
+def format_dates(table, date_format):
+    """Show first/last appearance as they are written in the export."""
+    return table.assign(**{
+        col: table[col].dt.strftime(date_format) for col in ['First Appearance', 'Last Appearance']
+    })
+
+
+def survey_tables(df_hubspot):
+    """Return the HubSpot (all surveys, NPS surveys, CSAT surveys) tables.
+
+    Surveys whose maximum score is 2 are CSAT surveys (``rating_scales``);
+    they are reported with a CSAT score instead of the NPS columns.
+    """
+    df_analysis = format_dates(summarise_scores(df_hubspot, 'Survey Name'), HUBSPOT_DATE_FORMAT)
+
+    is_csat = df_analysis['Survey Name'].map(rating_scales(df_hubspot['Rating'], df_hubspot['Survey Name'])) == 'CSAT'
+    df_csat = df_analysis[is_csat]
+    df_analysis_nps = df_analysis[~is_csat]
+    if len(df_csat) > 0:
+        df_csat = summarise_csat(df_csat, score_buckets(df_hubspot, 'Survey Name'), 'Survey Name')
+    return df_analysis, df_analysis_nps, df_csat
+
+
+def cohort_table(df_form):
+    """Google Form statistics and NPS per cohort (reported as 'Survey Name')."""
+    table = summarise_scores(df_form, 'Cohort').rename(columns={'Cohort': 'Survey Name'})
+    return format_dates(table, FORM_DATE_FORMAT)
+
+
+def form_overall_table(df_form):
+    """Single-row Google Form summary over every response with a rating."""
+    return format_dates(summarise_scores(df_form.dropna(subset=['Rating'])), FORM_DATE_FORMAT)
+
+
+def yearly_nps(df, exclude_surveys=()):
+    """NPS by year from ``FIRST_YEAR`` on, for ratings between 0 and 10.
+
+    ``exclude_surveys`` drops HubSpot surveys (e.g. the CSAT ones) first.
+    """
+    if len(exclude_surveys):
+        df = df[~df['Survey Name'].isin(exclude_surveys)]
+    df = df.assign(Year=df['Date'].dt.year).dropna(subset=['Rating', 'Year'])
+    df = df[(df['Year'] >= FIRST_YEAR) & (df['Rating'] >= 0) & (df['Rating'] <= 10)]
+    return summarise_nps(df.astype({'Year': int}), 'Year')
+
+
+def combined_yearly_nps(*yearly_tables):
+    """Sum yearly tables from several sources and recompute the NPS."""
+    df_year_combined = pd.concat(yearly_tables, ignore_index=True).groupby('Year', as_index=False)[COUNT_COLUMNS].sum()
+
+    # Recalculate NPS based on combined totals
+    df_year_combined['NPS Score'] = (
+        (df_year_combined['Promoters (9-10)'] / df_year_combined['Responses'])
+        - (df_year_combined['Detractors (0-6)'] / df_year_combined['Responses'])
+    ) * 100
+    df_year_combined['NPS Score'] = df_year_combined['NPS Score'].round().astype(int)
+    return df_year_combined
+
+
+def with_nps_intervals(table, level=0.95, method='bootstrap'):
+    """Append ``NPS Low``/``NPS High`` confidence bounds to a yearly, survey or cohort NPS table.
+
+    Survey and cohort tables score against every response, rated or not, so
+    the unrated ones are resampled alongside the passives.
+    """
+    counts = table.rename(columns={'Number of Responses': 'Responses'})
+    counts = counts.assign(**{'Passives (7-8)': counts['Responses'] - counts['Promoters (9-10)']
+                              - counts['Detractors (0-6)']})
+    return pd.concat([table, nps_intervals(counts, level, method)], axis=1)
+
+
+LEAD_TIMES = {
+    'Offer to Accept (days)': ('Offer Date', 'Accept Date'),
+    'Accept to Start (days)': ('Accept Date', 'Start Date'),
+    'Offer to Start (days)': ('Offer Date', 'Start Date'),
+}
+
+
+def lead_times(df_form):
+    """Median days between job offer, acceptance and start date, by year of response.
+
+    ``Responses`` counts the responses with all three dates; the others are
+    left out.
+    """
+    df = df_form.dropna(subset=['Date', 'Offer Date', 'Accept Date', 'Start Date'])
+    days = pd.DataFrame({
+        name: (df[end] - df[start]).dt.days for name, (start, end) in LEAD_TIMES.items()
+    })
+    grouped = days.groupby(df['Date'].dt.year.rename('Year'))
+    table = grouped.median().round(1)
+    table.insert(0, 'Responses', grouped.size())
+    return table.reset_index()
+
+
+def nps_trend(cube, sources=None, groups=None, level=None):
+    """Quarterly and yearly NPS series for the trend chart (yearly plotted at Q4).
+
+    With a confidence ``level`` (e.g. 0.95) each point also gets bootstrap
+    ``NPS Low``/``NPS High`` bounds.
+    """
+    # Quarterly NPS
+    quarterly = rollup(cube, ['Year', 'Quarter'], sources, groups)
+    nps_quarterly = pd.DataFrame({
+        'quarter_year': [f"{year}-Q{quarter}" for year, quarter in quarterly.index],
+        'Value': rounded_nps(quarterly).to_numpy(),
+    })
+    nps_quarterly['Period'] = 'Quarterly'
+
+    # Yearly NPS (plotted at Q4)
+    yearly = rollup(cube, 'Year', sources, groups)
+    nps_yearly = pd.DataFrame({
+        'quarter_year': yearly.index.astype(str) + '-Q4',
+        'Value': rounded_nps(yearly).to_numpy(),
+    })
+    nps_yearly['Period'] = 'Yearly'
+
+    if level is not None:
+        for series, counts in [(nps_quarterly, quarterly), (nps_yearly, yearly)]:
+            bounds = nps_intervals(counts, level)
+            series['NPS Low'] = bounds['NPS Low'].to_numpy()
+            series['NPS High'] = bounds['NPS High'].to_numpy()
+
+    plot_df = pd.concat([nps_quarterly, nps_yearly], ignore_index=True)
+    return plot_df.sort_values('quarter_year')
+
+
+def yearly_gauge(cube):
+    """Counts and rounded NPS per year over both sources, for the gauge."""
+    yearly = rollup(cube, 'Year')
+    return yearly.assign(**{'NPS Score': rounded_nps(yearly)})
+
+
+def build_report(hubspot_path=HUBSPOT_CSV, form_path=FORM_CSV):
+    """Return every dashboard table and trend series, keyed by a file-friendly name."""
+    df_hubspot = load_hubspot(hubspot_path, columns=['Survey Name', 'Rating', 'Date'])
+    df_form = load_form(form_path, columns=['Cohort', 'Rating', 'Date'])
+    df_dates = load_form(form_path, columns=['Date', 'Offer Date', 'Accept Date', 'Start Date'])
+    cube = load_cube(hubspot_path, form_path)
+
+    df_analysis, df_analysis_nps, df_csat = survey_tables(df_hubspot)
+    hubspot_yearly = yearly_nps(df_hubspot, df_csat['Survey Name'].unique())
+    form_yearly = yearly_nps(df_form)
+
+    report = {
+        'survey_analysis': df_analysis,
+        'survey_nps': df_analysis_nps,
+        'survey_csat': df_csat,
+        'cohort_nps': cohort_table(df_form),
+        'form_overall_nps': form_overall_table(df_form),
+        'hubspot_yearly_nps': hubspot_yearly,
+        'form_yearly_nps': form_yearly,
+        'combined_yearly_nps': combined_yearly_nps(hubspot_yearly, form_yearly),
+        'yearly_gauge': yearly_gauge(cube).reset_index(),
+        'form_lead_times': lead_times(df_dates),
+    }
+    for name, sources in DATA_SOURCES.items():
+        key = 'trend_' + name.lower().replace(' only', '').replace(' ', '_')
+        report[key] = nps_trend(cube, sources)
+    return report
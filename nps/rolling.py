@@ -0,0 +1,91 @@
+"""Rolling-window and cumulative NPS from daily response counts.
+
+Responses are counted once per source x survey/cohort x day (a table with
+one row per group per day that had responses). For any selection of sources
+and groups the days are summed, laid out on a continuous daily index and
+turned into running totals with ``np.cumsum``; a window of ``w`` days is then
+the difference of two running totals, so every series is one linear pass over
+the days and changing the window never goes back to the raw rows.
+"""
+
+import functools
+
+import numpy as np
+import pandas as pd
+
+from nps.cube import SOURCE_GROUPS
+from nps.loader import FORM_CSV, HUBSPOT_CSV, clean_df, file_key, load_form, load_hubspot
+from nps.metrics import count_responses
+
+DAILY_KEYS = ['Source', 'Group', 'Date']
+
+# Window choices for the dashboard (None = cumulative since the first response)
+WINDOWS = {
+    '30 days': 30,
+    '90 days': 90,
+    '365 days': 365,
+    'Cumulative': None,
+}
+
+
+def build_daily(frames):
+    """Count responses from ``{source: frame}`` per source, group and day."""
+    parts = []
+    for source, df in frames.items():
+        df = clean_df(df)
+        parts.append(count_responses(df, [
+            pd.Series(source, index=df.index, name='Source'),
+            df[SOURCE_GROUPS[source]].astype(object).rename('Group'),
+            df['Date'],
+        ]))
+    return pd.concat(parts).sort_index()
+
+
+@functools.lru_cache(maxsize=4)
+def _cached_daily(hubspot_key, form_key):
+    columns = ['Rating', 'Date']
+    return build_daily({
+        'HubSpot': load_hubspot(hubspot_key[0], columns=columns + ['Survey Name']),
+        'Google Form': load_form(form_key[0], columns=columns + ['Cohort']),
+    })
+
+
+def load_daily(hubspot_path=HUBSPOT_CSV, form_path=FORM_CSV):
+    """Return the daily counts for the current exports, rebuilt only when a file changes."""
+    return _cached_daily(file_key(hubspot_path), file_key(form_path))
+
+
+def cache_info():
+    """Return ``(hits, misses)`` of the daily counts cache."""
+    info = _cached_daily.cache_info()
+    return info.hits, info.misses
+
+
+def rolling_nps(daily, window=None, sources=None, groups=None):
+    """NPS over a trailing ``window`` of days (cumulative if None), for every day.
+
+    ``sources`` and ``groups`` restrict the counts as in ``rollup``. Returns
+    ``Date``, ``Responses`` (in the window) and ``NPS Score`` (one decimal),
+    for the days whose window holds at least one response.
+    """
+    mask = np.ones(len(daily), dtype=bool)
+    for level, values in [('Source', sources), ('Group', groups)]:
+        if values is not None:
+            mask &= daily.index.get_level_values(level).isin(values)
+    per_day = daily[mask].groupby(level='Date').sum()
+    if per_day.empty:
+        return pd.DataFrame({'Date': pd.Series(dtype='datetime64[us]'), 'Responses': [], 'NPS Score': []})
+
+    days = pd.date_range(per_day.index.min(), per_day.index.max(), freq='D')
+    per_day = per_day.reindex(days, fill_value=0)
+    totals = per_day[['Responses', 'Promoters (9-10)', 'Detractors (0-6)']].to_numpy().cumsum(axis=0)
+    if window is not None:
+        shifted = np.zeros_like(totals)
+        shifted[window:] = totals[:-window]
+        totals = totals - shifted
+
+    responses, promoters, detractors = totals.T
+    with np.errstate(invalid='ignore', divide='ignore'):
+        nps = np.round((promoters - detractors) / responses * 100, 1)
+    series = pd.DataFrame({'Date': days, 'Responses': responses, 'NPS Score': nps})
+    return series[responses > 0].reset_index(drop=True)
@@ -0,0 +1,158 @@
+"""Inverted-index full-text search over the Google Form comments.
+
+The index maps each token to the responses whose comments contain it, with
+per-response term counts, built from the shared token table in
+``nps.text``. A query looks up its terms' postings and scores only those
+responses with BM25, so query time depends on how many responses match, not
+on how many comments there are. The index is rebuilt only after new
+responses have been tokenized.
+"""
+
+import functools
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+
+from nps.loader import FORM_CSV, file_key
+from nps.text import STOPWORDS, TEXT_COLUMNS, TOKEN_PATTERN, comment_responses, shared_tokens, tokenize
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+SNIPPET_CHARS = 80
+
+
+class CommentIndex:
+    """Token -> (response keys, term counts) postings with BM25 ranking."""
+
+    def __init__(self, tokens):
+        # One document per response, over both questions
+        counts = tokens.groupby(['token', 'key'], sort=True)['count'].sum()
+        terms = counts.index.get_level_values('token').to_numpy()
+        self.keys = counts.index.get_level_values('key').to_numpy()
+        self.term_counts = counts.to_numpy()
+
+        starts = np.flatnonzero(np.r_[True, terms[1:] != terms[:-1]]) if len(terms) else np.array([], dtype=int)
+        ends = np.r_[starts[1:], len(terms)]
+        self.postings = {terms[start]: (start, end) for start, end in zip(starts, ends)}
+        self.vocabulary = pd.Index(list(self.postings))
+
+        lengths = tokens.groupby('key')['count'].sum()
+        self.doc_lengths = lengths
+        self.n_docs = len(lengths)
+        self.avg_length = lengths.mean() if len(lengths) else 0.0
+
+    def search(self, query):
+        """Return BM25 scores of the responses matching any query term, best first."""
+        terms = query_terms(query)
+        keys, scores = [], []
+        for term in terms:
+            if term not in self.postings:
+                continue
+            start, end = self.postings[term]
+            term_keys = self.keys[start:end]
+            tf = self.term_counts[start:end]
+            idf = np.log(1 + (self.n_docs - len(term_keys) + 0.5) / (len(term_keys) + 0.5))
+            length = self.doc_lengths.reindex(term_keys).to_numpy()
+            keys.append(term_keys)
+            scores.append(idf * tf * (K1 + 1) / (tf + K1 * (1 - B + B * length / self.avg_length)))
+        if not keys:
+            return pd.Series(dtype=float)
+        scores = pd.Series(np.concatenate(scores), index=np.concatenate(keys))
+        return scores.groupby(level=0).sum().sort_values(ascending=False)
+
+    def containing(self, text):
+        """Keys of the responses whose comments may contain ``text`` as a substring.
+
+        Every word of ``text`` must be part of some token of the response,
+        so the candidates are an intersection of postings. Returns ``None``
+        when the index cannot narrow the search (no indexed words, or a word
+        that could be inside a stop word); callers then check every row.
+        """
+        words = [word for word in re.split(TOKEN_PATTERN, text.lower()) if word]
+        candidates = None
+        for word in words:
+            if len(word) < 2 or any(word in stopword for stopword in STOPWORDS):
+                return None
+            tokens = self.vocabulary[self.vocabulary.str.contains(word, regex=False)]
+            keys = np.unique(np.concatenate(
+                [self.keys[slice(*self.postings[token])] for token in tokens] or [np.array([], dtype='uint64')]))
+            candidates = keys if candidates is None else np.intersect1d(candidates, keys, assume_unique=True)
+        return candidates
+
+
+def query_terms(query):
+    """Tokenize a query the same way the comments are tokenized."""
+    tokens = tokenize(pd.Series([query]))
+    return list(dict.fromkeys(tokens['token']))
+
+
+_index = None
+_indexed_responses = -1
+_lock = threading.Lock()
+
+
+def comment_index():
+    """Return the shared index, rebuilding it if new comments were tokenized."""
+    global _index, _indexed_responses
+    tokens = shared_tokens()
+    with _lock:
+        if _index is None or _indexed_responses != len(tokens.seen):
+            _index = CommentIndex(tokens.tokens)
+            _indexed_responses = len(tokens.seen)
+        return _index
+
+
+def highlight(text, terms, width=SNIPPET_CHARS):
+    """Return a snippet of ``text`` around the first query term, terms in bold."""
+    if not isinstance(text, str) or not terms:
+        return ''
+    pattern = re.compile(r"\b(" + "|".join(re.escape(term) for term in terms) + r")\b", re.IGNORECASE)
+    match = pattern.search(text)
+    if match is None:
+        return ''
+    start = max(match.start() - width, 0)
+    end = min(match.end() + width, len(text))
+    snippet = pattern.sub(lambda m: f"**{m.group(0)}**", text[start:end])
+    return ('…' if start > 0 else '') + snippet + ('…' if end < len(text) else '')
+
+
+@functools.lru_cache(maxsize=2)
+def _comment_table(path, mtime):
+    # Text of every response by key, once per file version; a repeated key was tokenized only once
+    responses = comment_responses(path, text=True)
+    return responses[~responses['key'].duplicated()].set_index('key')
+
+
+def search_comments(query, nps_classes=None, cohorts=None, start_date=None, end_date=None, limit=50,
+                    path=FORM_CSV):
+    """Ranked comments matching ``query``, with highlighted snippets.
+
+    ``nps_classes``, ``cohorts`` and the ``start_date``/``end_date`` range
+    filter the respondents; ``None`` keeps all.
+    """
+    table = _comment_table(*file_key(path))
+    scores = comment_index().search(query)
+
+    # Only the scored responses are looked up; keys no longer in the export are skipped
+    positions = table.index.get_indexer(scores.index)
+    found = positions >= 0
+    results = table.iloc[positions[found]].assign(Score=scores.to_numpy()[found])
+    if nps_classes is not None:
+        results = results[results['NPS Class'].isin(nps_classes)]
+    if cohorts is not None:
+        results = results[results['Cohort'].isin(cohorts)]
+    if start_date is not None:
+        results = results[results['Date'] >= pd.Timestamp(start_date)]
+    if end_date is not None:
+        results = results[results['Date'] < pd.Timestamp(end_date) + pd.Timedelta(days=1)]
+
+    results = results.sort_values('Score', ascending=False, kind='stable').head(limit)
+
+    terms = query_terms(query)
+    for question in TEXT_COLUMNS:
+        results[question] = [highlight(text, terms) for text in results[question]]
+    return results.reset_index(drop=True)
@@ -0,0 +1,198 @@
+"""Bitmap indexes for combining segment filters across the dashboard.
+
+Every HubSpot and Google Form response is one bit position (HubSpot rows
+first, then the form rows, in loader order). For each source, survey/cohort
+and NPS class a packed bitmap of the rows with that value is built once per
+export version, and the rows are kept in date order so a date range is a
+``searchsorted`` slice. Any combination of filters is then an OR of bitmaps
+within a filter, an AND across filters and a popcount; the loaded frames are
+only sliced when a page needs the segment's rows.
+
+When an ``NPS_DB`` store is set, a segment is a ``WHERE`` condition on the
+store's grouped queries instead: ``StoreSegments`` answers the filter values
+and counts in SQL and the segment cube and daily counts come from
+``store_cube``/``store_daily``, so the exports are not parsed.
+"""
+
+import functools
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from nps.cube import build_cube
+from nps.loader import FORM_CSV, HUBSPOT_CSV, file_key, load_form, load_hubspot
+from nps.rolling import build_daily
+from nps.store import store_cube, store_daily, store_path, store_segment_count, store_segment_values
+from nps.text import nps_class
+
+# Filter values; None (or empty) means no filter on that field
+Segment = namedtuple('Segment', ['sources', 'groups', 'nps_classes', 'start_date', 'end_date'],
+                     defaults=[None] * 5)
+
+HUBSPOT_COLUMNS = ['Survey Name', 'Rating', 'Date']
+FORM_COLUMNS = ['Cohort', 'Rating', 'Date']
+
+# Set bits per byte value
+_POPCOUNT = np.array([bin(value).count('1') for value in range(256)], dtype=np.int64)
+
+
+def is_empty(segment):
+    """True if ``segment`` does not filter anything."""
+    return segment is None or not any(segment)
+
+
+class SegmentIndex:
+    """Packed bitmaps per filter value over every response of both sources."""
+
+    def __init__(self, df_hubspot, df_form):
+        self.n_hubspot = len(df_hubspot)
+        self.n = self.n_hubspot + len(df_form)
+        source = np.repeat(['HubSpot', 'Google Form'], [self.n_hubspot, len(df_form)])
+        groups = pd.concat([df_hubspot['Survey Name'].astype(object), df_form['Cohort'].astype(object)],
+                           ignore_index=True)
+        ratings = pd.concat([df_hubspot['Rating'], df_form['Rating']], ignore_index=True)
+        dates = pd.concat([df_hubspot['Date'], df_form['Date']], ignore_index=True)
+
+        self.bitmaps = {
+            'sources': self._bitmaps(pd.Series(source)),
+            'groups': self._bitmaps(groups),
+            'nps_classes': self._bitmaps(nps_class(ratings)),
+        }
+        # Rows by date (NaT rows are left out of any date range)
+        dated = np.flatnonzero(dates.notna().to_numpy())
+        order = np.argsort(dates.to_numpy()[dated], kind='stable')
+        self.date_order = dated[order]
+        self.sorted_dates = dates.to_numpy()[self.date_order]
+
+    def _bitmaps(self, values):
+        codes, uniques = pd.factorize(values)
+        return {value: np.packbits(codes == code) for code, value in enumerate(uniques)}
+
+    def values(self, field):
+        """Sorted values that ``field`` can be filtered on."""
+        return sorted(self.bitmaps[field])
+
+    def all(self):
+        return np.packbits(np.ones(self.n, dtype=bool))
+
+    def select(self, segment):
+        """Packed bitmap of the responses in ``segment``."""
+        selected = self.all()
+        if is_empty(segment):
+            return selected
+        for field in self.bitmaps:
+            values = getattr(segment, field)
+            if values:
+                union = np.zeros_like(selected)
+                for value in values:
+                    if value in self.bitmaps[field]:
+                        union |= self.bitmaps[field][value]
+                selected &= union
+        if segment.start_date is not None or segment.end_date is not None:
+            start = 0 if segment.start_date is None else np.searchsorted(
+                self.sorted_dates, np.datetime64(pd.Timestamp(segment.start_date)), 'left')
+            end = len(self.sorted_dates) if segment.end_date is None else np.searchsorted(
+                self.sorted_dates, np.datetime64(pd.Timestamp(segment.end_date) + pd.Timedelta(days=1)), 'left')
+            in_range = np.zeros(self.n, dtype=bool)
+            in_range[self.date_order[start:end]] = True
+            selected &= np.packbits(in_range)
+        return selected
+
+    def count(self, bitmap):
+        """Number of responses in ``bitmap``."""
+        return int(_POPCOUNT[bitmap].sum())
+
+    def mask(self, bitmap):
+        """Boolean mask over all responses (HubSpot rows first)."""
+        return np.unpackbits(bitmap, count=self.n).astype(bool)
+
+    def positions(self, bitmap):
+        """Row positions of the segment in the HubSpot and in the Google Form frame."""
+        rows = np.flatnonzero(self.mask(bitmap))
+        split = np.searchsorted(rows, self.n_hubspot)
+        return rows[:split], rows[split:] - self.n_hubspot
+
+
+class StoreSegments:
+    """The ``SegmentIndex`` filter values and counts of an ``NPS_DB`` store, in SQL.
+
+    ``select`` returns the segment itself, which ``count`` counts with one
+    query per table; no rows are loaded, so there are no masks or positions.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._values, self.n = store_segment_values(db_path)
+
+    def values(self, field):
+        """Sorted values that ``field`` can be filtered on."""
+        return self._values[field]
+
+    def select(self, segment):
+        return segment
+
+    def count(self, segment):
+        """Number of responses in ``segment``."""
+        return store_segment_count(self.db_path, segment)
+
+
+def _rows(hubspot_key, form_key):
+    return load_hubspot(hubspot_key[0], columns=HUBSPOT_COLUMNS), load_form(form_key[0], columns=FORM_COLUMNS)
+
+
+@functools.lru_cache(maxsize=2)
+def _cached_index(hubspot_key, form_key):
+    return SegmentIndex(*_rows(hubspot_key, form_key))
+
+
+def load_segments(hubspot_path=HUBSPOT_CSV, form_path=FORM_CSV, store=True):
+    """Return the ``SegmentIndex`` for the current exports, rebuilt only when a file changes.
+
+    When an ``NPS_DB`` store is set it returns its ``StoreSegments`` instead,
+    unless ``store`` is False (for frames that hold the exports' rows).
+    """
+    db_path = store_path() if store else None
+    if db_path is not None:
+        return StoreSegments(db_path)
+    return _cached_index(file_key(hubspot_path), file_key(form_path))
+
+
+def _positions(index, segment, df_hubspot, df_form):
+    hubspot_rows, form_rows = index.positions(index.select(segment))
+    return df_hubspot.iloc[hubspot_rows], df_form.iloc[form_rows]
+
+
+def apply_segment(segment, df_hubspot, df_form, hubspot_path=HUBSPOT_CSV, form_path=FORM_CSV):
+    """Return the rows of the two loaded frames that fall in ``segment``.
+
+    The frames must be full loader frames with any columns, so their rows
+    line up with the index of the exports.
+    """
+    if is_empty(segment):
+        return df_hubspot, df_form
+    return _positions(load_segments(hubspot_path, form_path, store=False), segment, df_hubspot, df_form)
+
+
+@functools.lru_cache(maxsize=16)
+def _segment_counts(hubspot_key, form_key, segment, build):
+    df_hubspot, df_form = _rows(hubspot_key, form_key)
+    if not is_empty(segment):
+        df_hubspot, df_form = _positions(_cached_index(hubspot_key, form_key), segment, df_hubspot, df_form)
+    return build({'HubSpot': df_hubspot, 'Google Form': df_form})
+
+
+def segment_cube(segment, hubspot_path=HUBSPOT_CSV, form_path=FORM_CSV):
+    """The NPS cube of the responses in ``segment`` (cached per segment), from the store when one is set."""
+    db_path = store_path()
+    if db_path is not None:
+        return store_cube(db_path, segment)
+    return _segment_counts(file_key(hubspot_path), file_key(form_path), segment, build_cube)
+
+
+def segment_daily(segment, hubspot_path=HUBSPOT_CSV, form_path=FORM_CSV):
+    """The daily counts of the responses in ``segment`` (cached per segment), from the store when one is set."""
+    db_path = store_path()
+    if db_path is not None:
+        return store_daily(db_path, segment)
+    return _segment_counts(file_key(hubspot_path), file_key(form_path), segment, build_daily)
@@ -0,0 +1,219 @@
+"""Static snapshot of the Overview and Key Findings numbers.
+
+Usage::
+
+    python -m nps.snapshot [--out-dir nps_snapshot] [--hubspot PATH_OR_GLOB] [--form PATH_OR_GLOB]
+
+Every Overview table (with and without confidence intervals), including the
+respondent linkage summary and the deduplicated yearly NPS of every
+counting policy, the gauge of every selectable year and the trend series of
+every data-source option are computed once and written as ``snapshot.json`` plus a self-contained
+``index.html`` that renders them with a few lines of JavaScript. Any web
+server or CDN can serve the bundle, so read-only viewers cost no CPU on the
+Streamlit host. Directories and glob patterns are aggregated in parallel as
+by ``python -m nps``.
+"""
+
+import argparse
+import json
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pandas as pd
+
+from nps.cube import load_cube
+from nps.linkage import POLICIES, deduplicated_yearly_nps, link_responses, linkage_summary
+from nps.loader import FORM_CSV, HUBSPOT_CSV, export_files, load_form, load_hubspot
+from nps.report import DATA_SOURCES, build_report, nps_trend, with_nps_intervals
+
+# NPS tables the Overview page can show with confidence intervals
+INTERVAL_TABLES = ['survey_nps', 'cohort_nps', 'hubspot_yearly_nps', 'form_yearly_nps', 'combined_yearly_nps'] + [
+    f'deduplicated_yearly_nps_{policy}' for policy in POLICIES]
+
+# Columns the respondent linkage reads from each export
+LINKAGE_COLUMNS = [
+    (load_hubspot, ['Survey Name', 'Contact Id', 'Rating', 'Date']),
+    (load_form, ['Cohort', 'Contact ID', 'Rating', 'Date']),
+]
+
+TEMPLATE_HTML = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>NPS Snapshot</title>
+<style>
+body { font-family: Arial, sans-serif; margin: 2em; color: #333; }
+table { border-collapse: collapse; margin-bottom: 1.5em; font-size: 0.85em; }
+th, td { border: 1px solid #ddd; padding: 4px 8px; text-align: right; }
+th { background: #f4f4f4; }
+td:first-child, th:first-child { text-align: left; }
+.gauge { font-size: 3em; font-weight: bold; }
+</style>
+</head>
+<body>
+<h1>NPS Snapshot</h1>
+<p>Generated <span id="generated"></span>.</p>
+
+<h2>Annual NPS Score</h2>
+<select id="gauge-year"></select>
+<div id="gauge" class="gauge"></div>
+<div id="gauge-counts"></div>
+
+<h2>Quarterly vs Yearly NPS (Yearly Plotted at Q4)</h2>
+<select id="trend-source"></select>
+<label><input type="checkbox" id="trend-intervals"> Show 95% confidence intervals</label>
+<div><svg id="trend-chart" width="900" height="300"></svg></div>
+
+<h2>Tables</h2>
+<label><input type="checkbox" id="table-intervals"> Show 95% confidence intervals on the yearly tables</label>
+<div id="tables"></div>
+
+<script>
+const snapshot = __SNAPSHOT__;
+
+// Survey names, cohorts and answers come from the exports: escape everything put into markup
+function esc(value) {
+  return String(value ?? '').replace(/[&<>"']/g, c =>
+    ({'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'})[c]);
+}
+
+function renderTable(title, rows) {
+  if (!rows.length) return '<h3>' + esc(title) + '</h3><p>No rows</p>';
+  const columns = Object.keys(rows[0]);
+  const head = columns.map(c => '<th>' + esc(c) + '</th>').join('');
+  const body = rows.map(r => '<tr>' + columns.map(c => '<td>' + esc(r[c]) + '</td>').join('') + '</tr>').join('');
+  return '<h3>' + esc(title) + '</h3><table><tr>' + head + '</tr>' + body + '</table>';
+}
+
+function showTables() {
+  const intervals = document.getElementById('table-intervals').checked;
+  document.getElementById('tables').innerHTML = Object.entries(snapshot.tables).map(([name, rows]) =>
+    renderTable(name, intervals && snapshot.intervals[name] ? snapshot.intervals[name] : rows)).join('');
+}
+
+function showGauge() {
+  const year = snapshot.gauge[document.getElementById('gauge-year').value];
+  const gauge = document.getElementById('gauge');
+  gauge.textContent = year['NPS Score'];
+  gauge.style.color = year['NPS Score'] >= 50 ? '#00CC96' : year['NPS Score'] >= 0 ? '#FFA15A' : '#EF553B';
+  document.getElementById('gauge-counts').innerHTML = ['Responses', 'Promoters (9-10)', 'Passives (7-8)',
+    'Detractors (0-6)'].map(c => esc(c) + ': ' + esc(year[c])).join('<br>');
+}
+
+function showTrend() {
+  const points = snapshot.trends[document.getElementById('trend-source').value];
+  const intervals = document.getElementById('trend-intervals').checked;
+  const labels = [...new Set(points.map(p => p.quarter_year))];
+  const x = label => 40 + labels.indexOf(label) * 840 / Math.max(labels.length - 1, 1);
+  const y = value => 150 - value * 1.4;
+  const colors = {Quarterly: 'cyan', Yearly: 'purple'};
+  let svg = '<line x1="40" x2="880" y1="150" y2="150" stroke="#ccc"/>';
+  for (const period of ['Quarterly', 'Yearly']) {
+    const series = points.filter(p => p.Period === period);
+    if (intervals) {
+      const band = series.map(p => x(p.quarter_year) + ',' + y(p['NPS High']))
+        .concat(series.slice().reverse().map(p => x(p.quarter_year) + ',' + y(p['NPS Low'])));
+      svg += '<polygon points="' + band.join(' ') + '" fill="' + colors[period] + '" opacity="0.2"/>';
+    }
+    svg += '<polyline fill="none" stroke="' + colors[period] + '" points="' +
+      series.map(p => x(p.quarter_year) + ',' + y(p.Value)).join(' ') + '"/>';
+    svg += series.map(p => '<circle r="3" fill="' + colors[period] + '" cx="' + x(p.quarter_year) + '" cy="' +
+      y(p.Value) + '"><title>' + esc(p.quarter_year + ' ' + period + ': ' + p.Value) + '</title></circle>').join('');
+  }
+  document.getElementById('trend-chart').innerHTML = svg;
+}
+
+document.getElementById('generated').textContent = snapshot.generated;
+document.getElementById('gauge-year').innerHTML = Object.keys(snapshot.gauge).sort().reverse()
+  .map(year => '<option>' + esc(year) + '</option>').join('');
+document.getElementById('trend-source').innerHTML = Object.keys(snapshot.trends)
+  .map(name => '<option>' + esc(name) + '</option>').join('');
+document.getElementById('gauge-year').onchange = showGauge;
+document.getElementById('trend-source').onchange = showTrend;
+document.getElementById('trend-intervals').onchange = showTrend;
+document.getElementById('table-intervals').onchange = showTables;
+showGauge();
+showTrend();
+showTables();
+</script>
+</body>
+</html>
+"""
+
+
+def _records(df):
+    return json.loads(df.to_json(orient='records', date_format='iso'))
+
+
+def linkage_tables(linked, csat_surveys):
+    """Return the linkage summary and the deduplicated yearly NPS of every policy.
+
+    ``linked`` is the output of ``link_responses``; ``csat_surveys`` are left
+    out of the yearly tables, as on the Overview page.
+    """
+    tables = {'linkage_summary': linkage_summary(linked)}
+    for policy in POLICIES:
+        tables[f'deduplicated_yearly_nps_{policy}'] = deduplicated_yearly_nps(linked, policy, csat_surveys)
+    return tables
+
+
+def build_snapshot(report, cube, linked):
+    """Return every table, gauge year and trend series of ``report`` as plain JSON data.
+
+    ``report`` is keyed as in ``build_report``; ``cube`` is the NPS cube it
+    was built from, used for the trend confidence intervals, and ``linked``
+    the linked responses of the same exports (see ``link_responses``).
+    """
+    tables = dict(report, **linkage_tables(linked, report['survey_csat']['Survey Name'].unique()))
+    gauge = report['yearly_gauge'].set_index('Year')
+    return {
+        'generated': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'tables': {name: _records(table) for name, table in tables.items()},
+        'intervals': {name: _records(with_nps_intervals(tables[name])) for name in INTERVAL_TABLES},
+        'gauge': {str(year): {column: int(value) for column, value in counts.items()}
+                  for year, counts in gauge.iterrows()},
+        'trends': {name: _records(nps_trend(cube, sources, level=0.95)) for name, sources in DATA_SOURCES.items()},
+    }
+
+
+def write_snapshot(snapshot, out_dir):
+    """Write ``snapshot.json`` and ``index.html`` to ``out_dir``; return their paths."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    data = json.dumps(snapshot, indent=2)
+    json_path = out_dir / 'snapshot.json'
+    json_path.write_text(data)
+    html_path = out_dir / 'index.html'
+    # The data is inlined so the page works from any static host, or opened as a file
+    html_path.write_text(TEMPLATE_HTML.replace('__SNAPSHOT__', data.replace('</', '<\\/')))
+    return json_path, html_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Write a static HTML/JSON snapshot of the dashboard numbers.')
+    parser.add_argument('--hubspot', default=HUBSPOT_CSV, help='HubSpot export file, directory or glob')
+    parser.add_argument('--form', default=FORM_CSV, help='Google Form export file, directory or glob')
+    parser.add_argument('--out-dir', default='nps_snapshot', help='directory for the bundle')
+    parser.add_argument('--workers', type=int, help='worker processes for many files (default: one per CPU)')
+    args = parser.parse_args(argv)
+
+    if Path(args.hubspot).is_file() and Path(args.form).is_file():
+        report, cube = build_report(args.hubspot, args.form), load_cube(args.hubspot, args.form)
+    else:
+        from nps.ingest import ingest_exports
+        from nps.stream import streamed_report
+
+        exports, cube = ingest_exports(args.hubspot, args.form, args.workers)
+        report = streamed_report(exports, cube)
+
+    # Linkage needs every response's contact ID, so only those columns are read from each file
+    linked = link_responses(*[
+        pd.concat([load(path, columns=columns) for path in export_files(spec)], ignore_index=True)
+        for spec, (load, columns) in zip([args.hubspot, args.form], LINKAGE_COLUMNS)
+    ])
+    for path in write_snapshot(build_snapshot(report, cube, linked), args.out_dir):
+        print(f"Wrote {path}")
+
+
+if __name__ == '__main__':
+    main()
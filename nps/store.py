@@ -0,0 +1,366 @@
+"""Optional SQLite store behind the dashboard.
+
+Usage::
+
+    python -m nps.store [--db nps.db] [--hubspot hubspot.csv] [--form google_form.csv]
+
+The import command reads both exports in chunks and writes them to one
+SQLite file, with indexes on date, survey name, cohort and contact ID. When
+the ``NPS_DB`` environment variable points at that file, the pages get their
+tables and the NPS cube from grouped SQL queries (response counts, first/last
+dates and score bucket counts, the same partial aggregates the streaming
+path merges) instead of loading the exports into pandas, so only the small
+result tables are held in memory. A segment is a ``WHERE`` condition on the
+same queries, and the respondent linkage and data-quality counts are
+grouped in SQL too, so no stored rows are read into pandas.
+"""
+
+import argparse
+import functools
+import os
+import sqlite3
+from pathlib import Path
+
+import pandas as pd
+
+from nps.cube import CUBE_KEYS
+from nps.linkage import POLICIES
+from nps.loader import (CHUNK_SIZE, DATA_DIR, FORM_CSV, FORM_DATE_FORMAT, HUBSPOT_CSV, HUBSPOT_DATE_FORMAT, file_key,
+                        iter_form, iter_hubspot, parse_dates)
+from nps.metrics import COUNT_COLUMNS, bucket_scales, nps_from_counts, summarise_buckets, summarise_csat
+from nps.report import FIRST_YEAR, combined_yearly_nps, format_dates
+from nps.rolling import DAILY_KEYS
+
+DB_ENV = 'NPS_DB'
+DB_PATH = DATA_DIR / 'nps.db'
+
+# Dates are stored as sortable ISO text
+STORE_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# source -> (table, group column, loader column -> store column)
+TABLES = {
+    'HubSpot': ('hubspot', 'survey_name', {
+        'Record ID': 'record_id',
+        'Contact Id': 'contact_id',
+        'Survey Name': 'survey_name',
+        'Rating': 'rating',
+        'Date': 'date',
+    }),
+    'Google Form': ('form', 'cohort', {
+        'Contact ID': 'contact_id',
+        'Cohort': 'cohort',
+        'Rating': 'rating',
+        'Date': 'date',
+    }),
+}
+
+INDEXED_COLUMNS = ['date', 'survey_name', 'cohort', 'contact_id']
+
+_YEAR = "CAST(substr(date, 1, 4) AS INTEGER)"
+_MONTH = "CAST(substr(date, 6, 2) AS INTEGER)"
+
+# Segment NPS class -> rating condition, as ``nps.text.nps_class`` labels them
+_CLASS_RATINGS = {
+    'Promoter': "rating >= 9",
+    'Passive': "rating >= 7 AND rating < 9",
+    'Detractor': "rating >= 0 AND rating < 7",
+}
+
+
+def store_path():
+    """Return the database named by ``NPS_DB`` if it exists, else None."""
+    path = os.environ.get(DB_ENV)
+    if path and Path(path).exists():
+        return Path(path)
+    return None
+
+
+def import_exports(db_path=DB_PATH, hubspot_path=HUBSPOT_CSV, form_path=FORM_CSV, chunksize=CHUNK_SIZE):
+    """(Re)create the store from both exports; return rows written per source."""
+    db_path = Path(db_path)
+    db_path.unlink(missing_ok=True)
+    written = {}
+    with sqlite3.connect(db_path) as conn:
+        for source, path, iter_chunks in [('HubSpot', hubspot_path, iter_hubspot),
+                                          ('Google Form', form_path, iter_form)]:
+            table, _, columns = TABLES[source]
+            written[source] = 0
+            for chunk in iter_chunks(path, columns=list(columns), chunksize=chunksize):
+                chunk = chunk.assign(Date=chunk['Date'].dt.strftime(STORE_DATE_FORMAT))
+                chunk = chunk.astype({col: object for col in chunk.select_dtypes('category')})
+                chunk.rename(columns=columns)[list(columns.values())].to_sql(
+                    table, conn, if_exists='append', index=False)
+                written[source] += len(chunk)
+            for col in INDEXED_COLUMNS:
+                if col in columns.values():
+                    conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_{col} ON {table} ({col})")
+    return written
+
+
+def _quoted(values):
+    return ', '.join("'" + str(value).replace("'", "''") + "'" for value in values)
+
+
+def _segment_where(segment, source):
+    # Rows of the source's table in a ``nps.segments.Segment`` (None or empty for every row), as its index selects them
+    if segment is None or not any(segment):
+        return '1'
+    if segment.sources and source not in segment.sources:
+        return '0'
+    group = TABLES[source][1]
+    conditions = []
+    if segment.groups:
+        conditions.append(f"{group} IN ({_quoted(segment.groups)})")
+    if segment.nps_classes:
+        conditions.append('(' + ' OR '.join(f"({_CLASS_RATINGS.get(name, '0')})" for name in segment.nps_classes) + ')')
+    if segment.start_date is not None:
+        conditions.append(f"date >= '{pd.Timestamp(segment.start_date).strftime(STORE_DATE_FORMAT)}'")
+    if segment.end_date is not None:
+        end = pd.Timestamp(segment.end_date) + pd.Timedelta(days=1)
+        conditions.append(f"date < '{end.strftime(STORE_DATE_FORMAT)}'")
+    return ' AND '.join(conditions) or '1'
+
+
+def _group_stats(conn, table, group, where='1'):
+    stats = pd.read_sql_query(
+        f"""SELECT {group} AS key, COUNT(*) AS n, MIN(date) AS first, MAX(date) AS last
+            FROM {table} WHERE {where} GROUP BY key ORDER BY key""", conn)
+    return pd.DataFrame({
+        'Number of Responses': stats['n'].to_numpy(dtype='int64'),
+        'First Appearance': parse_dates(stats['first'], STORE_DATE_FORMAT).to_numpy(),
+        'Last Appearance': parse_dates(stats['last'], STORE_DATE_FORMAT).to_numpy(),
+    }, index=pd.Index(stats['key'], name='key'))
+
+
+def _score_buckets(conn, table, group, where='1'):
+    counts = pd.read_sql_query(
+        f"""SELECT {group} AS key, rating AS Rating, COUNT(*) AS n
+            FROM {table} WHERE rating IS NOT NULL AND {where} GROUP BY key, Rating""", conn)
+    return counts.set_index(['key', 'Rating'])['n'].unstack('Rating', fill_value=0).sort_index(axis=1)
+
+
+def _summary(conn, table, group, by, where='1'):
+    # Rows without a group are left out, as by groupby
+    where = f"{group} IS NOT NULL AND {where}" if by is not None else where
+    buckets = _score_buckets(conn, table, group, where)
+    summary = summarise_buckets(_group_stats(conn, table, group, where), buckets)
+    summary = summary.rename(columns={'key': by}) if by is not None else summary.drop(columns='key')
+    return summary, buckets.rename_axis(by)
+
+
+def _yearly(conn, table, where='1'):
+    year_where = (f"rating IS NOT NULL AND date IS NOT NULL AND rating BETWEEN 0 AND 10 "
+                  f"AND {_YEAR} >= {FIRST_YEAR} AND {where}")
+    summary, _ = _summary(conn, table, _YEAR, 'Year', year_where)
+    summary = summary.rename(columns={'Number of Responses': 'Responses'})
+    # A segment can leave no rows; the counts stay integers
+    summary = summary[['Year'] + COUNT_COLUMNS + ['NPS Score']]
+    return summary.astype({'Year': int, **dict.fromkeys(COUNT_COLUMNS, 'int64')})
+
+
+@functools.lru_cache(maxsize=16)
+def _store_report(path, mtime, segment):
+    hubspot_where, form_where = _segment_where(segment, 'HubSpot'), _segment_where(segment, 'Google Form')
+    with sqlite3.connect(path) as conn:
+        df_analysis, buckets = _summary(conn, 'hubspot', 'survey_name', 'Survey Name', hubspot_where)
+        df_analysis = format_dates(df_analysis, HUBSPOT_DATE_FORMAT)
+        is_csat = df_analysis['Survey Name'].map(bucket_scales(buckets)) == 'CSAT'
+        df_csat = df_analysis[is_csat]
+        if len(df_csat) > 0:
+            df_csat = summarise_csat(df_csat, buckets, 'Survey Name')
+
+        cohorts, _ = _summary(conn, 'form', 'cohort', 'Cohort', form_where)
+        overall, _ = _summary(conn, 'form', "'_all'", None, f'rating IS NOT NULL AND {form_where}')
+
+        csat_surveys = _quoted(df_csat['Survey Name'])
+        hubspot_yearly = _yearly(conn, 'hubspot', f"(survey_name IS NULL OR survey_name NOT IN ({csat_surveys})) "
+                                 f"AND {hubspot_where}" if csat_surveys else hubspot_where)
+        form_yearly = _yearly(conn, 'form', form_where)
+
+    return {
+        'survey_analysis': df_analysis,
+        'survey_nps': df_analysis[~is_csat],
+        'survey_csat': df_csat,
+        'cohort_nps': format_dates(cohorts.rename(columns={'Cohort': 'Survey Name'}), FORM_DATE_FORMAT),
+        'form_overall_nps': format_dates(overall, FORM_DATE_FORMAT),
+        'hubspot_yearly_nps': hubspot_yearly,
+        'form_yearly_nps': form_yearly,
+        'combined_yearly_nps': combined_yearly_nps(hubspot_yearly, form_yearly),
+    }
+
+
+def store_report(db_path, segment=None):
+    """Return the Overview tables, keyed as in ``build_report``, computed in SQL.
+
+    With a ``nps.segments.Segment`` only the responses in it are counted.
+    """
+    return _store_report(*file_key(db_path), segment)
+
+
+def _groups(values):
+    # Strings as the loaders have them; rows without a group stay missing rather than 'None'
+    return values.astype('str').where(values.notna())
+
+
+@functools.lru_cache(maxsize=16)
+def _store_cube(path, mtime, segment):
+    queries = []
+    for source, (table, group, _) in TABLES.items():
+        queries.append(f"""
+            SELECT '{source}' AS Source, {group} AS "Group", {_YEAR} AS Year, ({_MONTH} + 2) / 3 AS Quarter,
+                   {_MONTH} AS Month, COUNT(*) AS Responses, SUM(rating >= 9) AS "Promoters (9-10)",
+                   SUM(rating >= 7 AND rating < 9) AS "Passives (7-8)", SUM(rating < 7) AS "Detractors (0-6)"
+            FROM {table} WHERE rating IS NOT NULL AND date IS NOT NULL AND {_segment_where(segment, source)}
+            GROUP BY "Group", Year, Quarter, Month""")
+    with sqlite3.connect(path) as conn:
+        cube = pd.read_sql_query(' UNION ALL '.join(queries), conn)
+    cube = cube.astype({'Year': 'int32', 'Quarter': 'int32', 'Month': 'int32', **dict.fromkeys(COUNT_COLUMNS, 'int64')})
+    cube = cube.assign(Group=_groups(cube['Group']))
+    return cube.set_index(CUBE_KEYS).sort_index()
+
+
+def store_cube(db_path, segment=None):
+    """Return the NPS cube (as ``load_cube``) aggregated in SQL, of the responses in ``segment`` if given."""
+    return _store_cube(*file_key(db_path), segment)
+
+
+@functools.lru_cache(maxsize=16)
+def _store_daily(path, mtime, segment):
+    queries = []
+    for source, (table, group, _) in TABLES.items():
+        queries.append(f"""
+            SELECT '{source}' AS Source, {group} AS "Group", substr(date, 1, 10) AS day,
+                   COUNT(*) AS Responses, SUM(rating >= 9) AS "Promoters (9-10)",
+                   SUM(rating >= 7 AND rating < 9) AS "Passives (7-8)", SUM(rating < 7) AS "Detractors (0-6)"
+            FROM {table} WHERE rating IS NOT NULL AND date IS NOT NULL AND {_segment_where(segment, source)}
+            GROUP BY "Group", day""")
+    with sqlite3.connect(path) as conn:
+        daily = pd.read_sql_query(' UNION ALL '.join(queries), conn)
+    daily = daily.astype(dict.fromkeys(COUNT_COLUMNS, 'int64'))
+    daily = daily.assign(Group=_groups(daily['Group']), day=parse_dates(daily['day'], '%Y-%m-%d'))
+    daily = daily.rename(columns={'day': 'Date'})
+    return daily.set_index(DAILY_KEYS).sort_index()
+
+
+def store_daily(db_path, segment=None):
+    """Return the daily counts (as ``load_daily``) aggregated in SQL, of the responses in ``segment`` if given."""
+    return _store_daily(*file_key(db_path), segment)
+
+
+# Deduplication policy -> (window order of a respondent's responses in a year, kept rating)
+_DEDUPE = {
+    'latest': ("day DESC, source DESC, row DESC", "rating"),
+    'first': ("day, source, row", "rating"),
+    'average': ("day DESC, source DESC, row DESC",
+                "CASE WHEN contact_id IS NULL THEN rating ELSE AVG(rating) OVER respondent END"),
+}
+
+
+def _responses(segment):
+    # The scored responses ``link_responses`` keeps, HubSpot first and each in import order
+    return ' UNION ALL '.join(f"""
+        SELECT {number} AS source, rowid AS row, {group} AS grp, contact_id, rating, substr(date, 1, 10) AS day
+        FROM {table} WHERE rating IS NOT NULL AND date IS NOT NULL AND {_segment_where(segment, source)}"""
+                              for number, (source, (table, group, _)) in enumerate(TABLES.items()))
+
+
+def _linkage_summary(conn, segment):
+    summary = pd.read_sql_query(f"""
+        WITH responses AS ({_responses(segment)}),
+             contacts AS (SELECT COUNT(*) AS n, MIN(source) < MAX(source) AS both_sources
+                          FROM responses WHERE contact_id IS NOT NULL GROUP BY contact_id)
+        SELECT (SELECT COUNT(*) FROM responses) AS "Responses",
+               (SELECT COUNT(*) FROM responses WHERE contact_id IS NULL) AS "Without Contact ID",
+               COUNT(*) AS "Respondents", COALESCE(SUM(both_sources), 0) AS "In Both Sources",
+               COALESCE(SUM(n > 1), 0) AS "Repeat Respondents",
+               COALESCE(SUM(n), 0) - COUNT(*) AS "Duplicate Responses"
+        FROM contacts""", conn)
+    return summary.astype('int64')
+
+
+def _deduplicated_yearly(conn, segment, policy, csat_surveys):
+    csat = f"NOT (source = 0 AND grp IS NOT NULL AND grp IN ({csat_surveys}))" if csat_surveys else '1'
+    if policy is None:
+        kept, rating = '1', 'rating'
+    else:
+        order, rating = _DEDUPE[policy]
+        kept = f"contact_id IS NULL OR ROW_NUMBER() OVER (respondent ORDER BY {order}) = 1"
+    counts = pd.read_sql_query(f"""
+        WITH responses AS ({_responses(segment)}),
+             scored AS (SELECT *, CAST(substr(day, 1, 4) AS INTEGER) AS year FROM responses
+                        WHERE rating BETWEEN 0 AND 10 AND {csat}),
+             kept AS (SELECT year, {rating} AS rating, {kept} AS kept FROM scored WHERE year >= {FIRST_YEAR}
+                      WINDOW respondent AS (PARTITION BY contact_id, year))
+        SELECT year AS Year, COUNT(*) AS Responses, SUM(rating >= 9) AS "Promoters (9-10)",
+               SUM(rating >= 7 AND rating < 9) AS "Passives (7-8)", SUM(rating < 7) AS "Detractors (0-6)"
+        FROM kept WHERE kept GROUP BY year ORDER BY year""", conn).astype('int64')
+    return counts.assign(**{'NPS Score': nps_from_counts(counts).round().astype(int)})
+
+
+@functools.lru_cache(maxsize=16)
+def _store_linkage(path, mtime, csat_surveys, segment):
+    csat_surveys = _quoted(csat_surveys)
+    with sqlite3.connect(path) as conn:
+        tables = {'linkage_summary': _linkage_summary(conn, segment)}
+        for policy in POLICIES:
+            tables[f'deduplicated_yearly_nps_{policy}'] = _deduplicated_yearly(conn, segment, policy, csat_surveys)
+    return tables
+
+
+def store_linkage_tables(db_path, csat_surveys, segment=None):
+    """Return the ``nps.snapshot.linkage_tables`` of the stored responses, grouped in SQL.
+
+    Respondents are linked on the stored contact IDs, and each policy keeps
+    the response ``nps.linkage.dedupe_responses`` keeps; ``csat_surveys``
+    are left out of the yearly tables and ``segment`` limits the responses.
+    """
+    return _store_linkage(*file_key(db_path), tuple(csat_surveys), segment)
+
+
+@functools.lru_cache(maxsize=2)
+def _store_segment_values(path, mtime):
+    classes = ' '.join(f"WHEN {condition} THEN '{name}'" for name, condition in _CLASS_RATINGS.items())
+    sources, groups, nps_classes, n = [], set(), set(), 0
+    with sqlite3.connect(path) as conn:
+        for source, (table, group, _) in TABLES.items():
+            rows = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            sources += [source] if rows else []
+            groups.update(value for value, in conn.execute(f"SELECT DISTINCT {group} FROM {table}"))
+            nps_classes.update(value for value, in conn.execute(f"SELECT DISTINCT CASE {classes} END FROM {table}"))
+            n += rows
+    return {'sources': sorted(sources), 'groups': sorted(groups - {None}),
+            'nps_classes': sorted(nps_classes - {None})}, n
+
+
+def store_segment_values(db_path):
+    """Return the sorted values of every segment field in the store, and its number of rows."""
+    return _store_segment_values(*file_key(db_path))
+
+
+@functools.lru_cache(maxsize=16)
+def _store_segment_count(path, mtime, segment):
+    with sqlite3.connect(path) as conn:
+        return sum(conn.execute(f"SELECT COUNT(*) FROM {table} WHERE {_segment_where(segment, source)}").fetchone()[0]
+                   for source, (table, _, _) in TABLES.items())
+
+
+def store_segment_count(db_path, segment):
+    """Number of stored responses in ``segment``."""
+    return _store_segment_count(*file_key(db_path), segment)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Import the exports into a SQLite store.')
+    parser.add_argument('--db', default=DB_PATH, help='database file to (re)create')
+    parser.add_argument('--hubspot', default=HUBSPOT_CSV, help='HubSpot export')
+    parser.add_argument('--form', default=FORM_CSV, help='Google Form export')
+    parser.add_argument('--chunksize', type=int, default=CHUNK_SIZE, help='rows per chunk')
+    args = parser.parse_args(argv)
+
+    for source, rows in import_exports(args.db, args.hubspot, args.form, args.chunksize).items():
+        print(f"{source}: {rows} rows")
+    print(f"Wrote {args.db}; set {DB_ENV}={args.db} to serve the dashboard from it")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+"""Streaming, constant-memory aggregation of very large exports.
+
+The exports are read in chunks of a bounded number of rows. Each chunk is
+cleaned as the loader cleans a whole file and folded into additive
+aggregates: per-group response counts and first/last dates, per-group score
+bucket counts (which give min/max/mean/mode/median, NPS and CSAT), the same
+over all rated rows, per-year rating counts and the NPS cube. Aggregates of
+separate files merge the same way (``StreamedExport.merge``). Only the
+aggregates outlive a chunk, so peak memory depends on the chunk size and the
+number of surveys/cohorts, not on the size of the file.
+The tables built from them match the in-memory ones.
+
+Usage::
+
+    python -m nps.stream [--chunksize 100000]
+"""
+
+import argparse
+
+import pandas as pd
+
+from nps.cube import SOURCE_GROUPS, build_cube
+from nps.loader import (CHUNK_SIZE, FORM_CSV, FORM_DATE_FORMAT, HUBSPOT_CSV, HUBSPOT_DATE_FORMAT, iter_form,
+                        iter_hubspot)
+from nps.metrics import NPS_COLUMNS, bucket_scales, group_stats, score_buckets, summarise_buckets, summarise_csat
+from nps.report import DATA_SOURCES, FIRST_YEAR, combined_yearly_nps, format_dates, nps_trend, yearly_gauge
+
+
+def _levels(df):
+    return list(range(df.index.nlevels))
+
+
+def _add_counts(total, part):
+    if part is None:
+        return total
+    if total is None:
+        return part
+    merged = pd.concat([total, part]).groupby(level=_levels(part), dropna=False).sum()
+    return merged.astype('int64')
+
+
+def _merge_stats(total, part):
+    if part is None:
+        return total
+    if total is None:
+        return part
+    return pd.concat([total, part]).groupby(level=_levels(part)).agg({
+        'Number of Responses': 'sum',
+        'First Appearance': 'min',
+        'Last Appearance': 'max',
+    })
+
+
+class StreamedExport:
+    """Additive aggregates of one export, folded chunk by chunk."""
+
+    def __init__(self, source):
+        self.source = source
+        self.group = SOURCE_GROUPS[source]
+        self.stats = None
+        self.buckets = None
+        self.cube = None
+        # Rows with a rating, over the whole export
+        self.overall_stats = None
+        self.overall_buckets = None
+        # Responses per group, year and rating, for the yearly tables
+        self.yearly_counts = None
+
+    def fold(self, chunk):
+        # Chunks carry their own categories; compare group labels as plain objects
+        # (not 'str', which turns a missing label into 'nan' on older pandas)
+        chunk = chunk.astype({self.group: object})
+        self.stats = _merge_stats(self.stats, group_stats(chunk, self.group))
+        self.buckets = _add_counts(self.buckets, score_buckets(chunk, self.group)).sort_index(axis=1)
+        self.cube = _add_counts(self.cube, build_cube({self.source: chunk}))
+
+        rated = chunk.dropna(subset=['Rating'])
+        self.overall_stats = _merge_stats(self.overall_stats, group_stats(rated))
+        self.overall_buckets = _add_counts(self.overall_buckets, score_buckets(rated)).sort_index(axis=1)
+
+        rated = rated.dropna(subset=['Date'])
+        rated = rated[(rated['Rating'] >= 0) & (rated['Rating'] <= 10)]
+        counts = rated.groupby([rated[self.group], rated['Date'].dt.year.rename('Year'), rated['Rating']],
+                               dropna=False, observed=True).size().to_frame('Responses')
+        self.yearly_counts = _add_counts(self.yearly_counts, counts)
+
+    def merge(self, other):
+        """Add the aggregates of ``other`` (the same source, other rows) into this one."""
+        self.stats = _merge_stats(self.stats, other.stats)
+        self.buckets = _add_counts(self.buckets, other.buckets).sort_index(axis=1)
+        self.cube = _add_counts(self.cube, other.cube)
+        self.overall_stats = _merge_stats(self.overall_stats, other.overall_stats)
+        self.overall_buckets = _add_counts(self.overall_buckets, other.overall_buckets).sort_index(axis=1)
+        self.yearly_counts = _add_counts(self.yearly_counts, other.yearly_counts)
+        return self
+
+    def summary(self):
+        """Per-survey/cohort table, as ``summarise_scores`` on the whole file."""
+        return summarise_buckets(self.stats, self.buckets)
+
+    def csat(self):
+        """CSAT table for the surveys scored out of 2, as on the Overview page."""
+        summary = self.summary()
+        is_csat = summary[self.group].map(bucket_scales(self.buckets)) == 'CSAT'
+        return summarise_csat(summary[is_csat], self.buckets, self.group)
+
+    def overall(self):
+        """Single-row summary over every response with a rating."""
+        return summarise_buckets(self.overall_stats, self.overall_buckets)
+
+    def yearly(self, exclude_groups=()):
+        """NPS by year from ``FIRST_YEAR`` on, as ``yearly_nps`` on the whole file."""
+        counts = self.yearly_counts['Responses']
+        groups = counts.index.get_level_values(0)
+        years = counts.index.get_level_values('Year')
+        counts = counts[~groups.isin(exclude_groups) & (years >= FIRST_YEAR)]
+        buckets = counts.groupby(level=['Year', 'Rating']).sum().unstack('Rating', fill_value=0).sort_index(axis=1)
+        stats = pd.DataFrame({
+            'Number of Responses': buckets.sum(axis=1),
+            'First Appearance': pd.NaT,
+            'Last Appearance': pd.NaT,
+        })
+        summary = summarise_buckets(stats, buckets).astype({'Year': int})
+        summary = summary[['Year', 'Number of Responses'] + NPS_COLUMNS]
+        return summary.rename(columns={'Number of Responses': 'Responses'})
+
+
+def stream_exports(hubspot_path=HUBSPOT_CSV, form_path=FORM_CSV, chunksize=CHUNK_SIZE):
+    """Fold both exports chunk by chunk; return ``({source: StreamedExport}, cube)``."""
+    exports = {}
+    for source, path, iter_chunks in [('HubSpot', hubspot_path, iter_hubspot),
+                                      ('Google Form', form_path, iter_form)]:
+        exports[source] = StreamedExport(source)
+        columns = [SOURCE_GROUPS[source], 'Rating', 'Date']
+        for chunk in iter_chunks(path, columns=columns, chunksize=chunksize):
+            exports[source].fold(chunk)
+
+    cube = pd.concat([export.cube for export in exports.values()]).sort_index()
+    return exports, cube
+
+
+def streamed_report(exports, cube):
+    """Return the Overview tables and trend series, keyed as in ``build_report``."""
+    hubspot, form = exports['HubSpot'], exports['Google Form']
+    df_analysis = format_dates(hubspot.summary(), HUBSPOT_DATE_FORMAT)
+    is_csat = df_analysis['Survey Name'].map(bucket_scales(hubspot.buckets)) == 'CSAT'
+    df_csat = df_analysis[is_csat]
+    if len(df_csat) > 0:
+        df_csat = summarise_csat(df_csat, hubspot.buckets, 'Survey Name')
+    hubspot_yearly = hubspot.yearly(df_csat['Survey Name'].unique())
+    form_yearly = form.yearly()
+
+    report = {
+        'survey_analysis': df_analysis,
+        'survey_nps': df_analysis[~is_csat],
+        'survey_csat': df_csat,
+        'cohort_nps': format_dates(form.summary().rename(columns={'Cohort': 'Survey Name'}), FORM_DATE_FORMAT),
+        'form_overall_nps': format_dates(form.overall(), FORM_DATE_FORMAT),
+        'hubspot_yearly_nps': hubspot_yearly,
+        'form_yearly_nps': form_yearly,
+        'combined_yearly_nps': combined_yearly_nps(hubspot_yearly, form_yearly),
+        'yearly_gauge': yearly_gauge(cube).reset_index(),
+    }
+    for name, sources in DATA_SOURCES.items():
+        key = 'trend_' + name.lower().replace(' only', '').replace(' ', '_')
+        report[key] = nps_trend(cube, sources)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Aggregate the exports in bounded-size chunks.')
+    parser.add_argument('--hubspot', default=HUBSPOT_CSV, help='HubSpot export')
+    parser.add_argument('--form', default=FORM_CSV, help='Google Form export')
+    parser.add_argument('--chunksize', type=int, default=CHUNK_SIZE, help='rows per chunk')
+    args = parser.parse_args(argv)
+
+    exports, _ = stream_exports(args.hubspot, args.form, args.chunksize)
+    for source, export in exports.items():
+        print(f"{source} by {export.group}")
+        print(export.summary().to_string(index=False))
+        print()
+
+
+if __name__ == '__main__':
+    main()
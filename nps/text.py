@@ -0,0 +1,162 @@
+"""Term frequencies over the Google Form free-text answers.
+
+Comments are tokenized with vectorized string operations into a long table
+of per-response token counts, which is kept between calls: when the export
+changes only responses that have not been tokenized before are processed.
+Term frequencies for any segment (NPS class, year, cohort) are then a filter
+and a ``groupby`` over that table, with no re-tokenization.
+"""
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+from nps.incremental import FORM_KEY, row_keys
+from nps.loader import FORM_CSV, load_form, load_form_text
+
+# Free-text questions, keyed by the short name used in the dashboard
+TEXT_COLUMNS = {
+    'What did we do well?': 'What did we do well?',
+    'How could we improve?': 'How could careers support at Makers be improved?',
+}
+
+NPS_CLASSES = ['Promoter', 'Passive', 'Detractor']
+
+STOPWORDS = frozenset("""
+a about above after again all also am an and any are as at be because been before being below between both
+but by can could did do does doing don down during each even few for from further get got had has have
+having he her here hers herself him himself his how i if in into is it its itself just like me more most
+much my myself n/a na no nor not now of off on once only or other our ours ourselves out over own really
+same she should so some such than that the their theirs them themselves then there these they this those
+through to too under until up us very was we were what when where which while who whom why will with
+would you your yours yourself yourselves i'm i've it's didn't don't
+""".split())
+
+TOKEN_PATTERN = r"[^a-z']+"
+
+
+def nps_class(ratings):
+    """Label ratings as Promoter (9-10), Passive (7-8) or Detractor (0-6)."""
+    conditions = [(ratings >= bound).to_numpy(dtype=bool, na_value=False) for bound in (9, 7, 0)]
+    labels = np.select(conditions, NPS_CLASSES, default='')
+    return pd.Series(labels, index=ratings.index).replace('', np.nan)
+
+
+def tokenize(comments):
+    """Return per-response token counts for a Series of comments.
+
+    The result has one row per (response index, token) with a ``count``
+    column. Tokens are lower-cased words of two or more letters that are not
+    stop words.
+    """
+    words = (
+        comments.dropna().str.lower()
+        .str.replace(TOKEN_PATTERN, ' ', regex=True)
+        .str.split()
+        .explode()
+        .dropna()
+    )
+    words = words.str.strip("'")
+    words = words[(words.str.len() > 1) & ~words.isin(STOPWORDS)]
+    counts = words.groupby([words.index, words.values]).size()
+    counts.index.names = ['row', 'token']
+    return counts.rename('count').reset_index()
+
+
+class CommentTokens:
+    """Token counts of every tokenized response, grown incrementally."""
+
+    def __init__(self):
+        self.seen = pd.Index([], dtype='uint64')
+        self.tokens = pd.DataFrame({
+            'key': pd.Series(dtype='uint64'),
+            'question': pd.Series(dtype='str'),
+            'token': pd.Series(dtype='str'),
+            'count': pd.Series(dtype='int64'),
+        })
+        self._lock = threading.Lock()
+
+    def update(self, df):
+        """Tokenize the responses of ``df`` not seen before; return how many."""
+        with self._lock:
+            keys = row_keys(df, FORM_KEY)
+            new = ~pd.Index(keys).isin(self.seen) & ~pd.Index(keys).duplicated()
+            if not new.any():
+                return 0
+
+            df = df[new].reset_index(drop=True)
+            new_keys = keys[new]
+            parts = [self.tokens]
+            for question, column in TEXT_COLUMNS.items():
+                tokens = tokenize(df[column])
+                parts.append(pd.DataFrame({
+                    'key': new_keys[tokens['row'].to_numpy()],
+                    'question': question,
+                    'token': tokens['token'],
+                    'count': tokens['count'],
+                }))
+            self.tokens = pd.concat(parts, ignore_index=True)
+            self.seen = self.seen.append(pd.Index(new_keys))
+            return int(new.sum())
+
+    def frequencies(self, keys=None, question=None):
+        """Total count per token over the responses in ``keys`` (all if None)."""
+        tokens = self.tokens
+        if question is not None:
+            tokens = tokens[tokens['question'] == question]
+        if keys is not None:
+            tokens = tokens[tokens['key'].isin(keys)]
+        return tokens.groupby('token')['count'].sum().sort_values(ascending=False, kind='stable')
+
+
+_comment_tokens = CommentTokens()
+
+
+def shared_tokens():
+    """Return the process-wide ``CommentTokens`` used by the dashboard."""
+    return _comment_tokens
+
+
+def comment_responses(path=FORM_CSV, text=False):
+    """Return the form responses with their key, NPS class, year and cohort.
+
+    Also brings the shared token table up to date with any new responses.
+    With ``text=True`` the rating, date and free-text answers are included.
+    """
+    df = load_form(path, columns=['Cohort', 'Rating', 'Date', 'Contact ID']).join(
+        load_form_text(TEXT_COLUMNS.values(), path))
+    _comment_tokens.update(df)
+    responses = pd.DataFrame({
+        'key': row_keys(df, FORM_KEY),
+        'NPS Class': nps_class(df['Rating']),
+        'Year': df['Date'].dt.year,
+        'Cohort': df['Cohort'],
+    })
+    if text:
+        responses['Rating'] = df['Rating']
+        responses['Date'] = df['Date']
+        for question, column in TEXT_COLUMNS.items():
+            responses[question] = df[column]
+    return responses
+
+
+def comment_cohorts(path=FORM_CSV):
+    """Sorted cohort names of the form respondents."""
+    return sorted(comment_responses(path)['Cohort'].dropna().unique())
+
+
+def term_frequencies(question=None, nps_classes=None, years=None, cohorts=None, top=None, path=FORM_CSV):
+    """Term frequencies over the comments of one segment of respondents.
+
+    ``nps_classes``, ``years`` and ``cohorts`` restrict the respondents;
+    ``None`` keeps all. ``question`` is a key of ``TEXT_COLUMNS`` (all
+    questions if None). Returns the ``top`` most frequent terms.
+    """
+    responses = comment_responses(path)
+    mask = np.ones(len(responses), dtype=bool)
+    for column, values in [('NPS Class', nps_classes), ('Year', years), ('Cohort', cohorts)]:
+        if values is not None:
+            mask &= responses[column].isin(values).to_numpy()
+    frequencies = _comment_tokens.frequencies(responses.loc[mask, 'key'], question)
+    return frequencies if top is None else frequencies.head(top)
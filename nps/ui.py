@@ -0,0 +1,75 @@
+"""Streamlit helpers shared by the dashboard pages.
+
+Kept apart from the rest of the package so that ``nps`` itself can be used
+without importing Streamlit.
+"""
+
+import pandas as pd
+import streamlit as st
+
+from nps import warmup
+from nps.instrument import Profiler, profiling_enabled
+from nps.segments import Segment, load_segments
+
+SEGMENT_STATE = 'segment'
+
+
+def page_profiler(page):
+    """Return a ``Profiler`` for this page run.
+
+    Enabled by ``NPS_PROFILE`` or by opening the page with ``?profile=1``.
+    """
+    enabled = profiling_enabled() or st.query_params.get('profile', '').lower() in ('1', 'true', 'yes')
+    return Profiler(page, enabled)
+
+
+def show_profile(profiler):
+    """Show the stage timings in a sidebar expander and write the JSON log."""
+    if not profiler.enabled:
+        return
+    profiler.write_log()
+    with st.sidebar.expander(f"Performance: {profiler.total_seconds():.3f}s", expanded=True):
+        st.dataframe(pd.DataFrame(profiler.records), use_container_width=True, hide_index=True)
+        if warmup.startup_report is not None:
+            st.caption(f"Server warm-up: {warmup.startup_report.total_seconds():.3f}s")
+            st.dataframe(pd.DataFrame(warmup.startup_report.records), use_container_width=True, hide_index=True)
+
+
+def show_word_cloud(frequencies, width=800, height=400):
+    """Render a word cloud of ``{term: count}``; needs the ``wordcloud`` package."""
+    try:
+        from wordcloud import WordCloud
+    except ImportError:
+        st.info("Install the `wordcloud` package to see a word cloud of these terms.")
+        return
+    if len(frequencies) == 0:
+        st.info("No comments match this selection.")
+        return
+    cloud = WordCloud(width=width, height=height, background_color='white')
+    st.image(cloud.generate_from_frequencies(dict(frequencies)).to_array(), use_container_width=True)
+
+
+def segment_sidebar():
+    """Render the segment filters in the sidebar and return the ``Segment``.
+
+    The choice is kept in the session, so it carries over between pages.
+    """
+    index = load_segments()
+    saved = st.session_state.setdefault(SEGMENT_STATE, Segment())
+    with st.sidebar.expander("Segment", expanded=any(saved)):
+        sources = st.multiselect("Source", index.values('sources'), default=saved.sources or [],
+                                 key="segment_sources")
+        groups = st.multiselect("Survey / Cohort", index.values('groups'), default=saved.groups or [],
+                                key="segment_groups")
+        nps_classes = st.multiselect("NPS Class", index.values('nps_classes'), default=saved.nps_classes or [],
+                                     key="segment_classes")
+        saved_dates = tuple(date for date in (saved.start_date, saved.end_date) if date is not None)
+        dates = st.date_input("Responses between", value=saved_dates, key="segment_dates")
+
+        start_date, end_date = (tuple(dates) + (None, None))[:2] if dates else (None, None)
+        segment = Segment(tuple(sources) or None, tuple(groups) or None, tuple(nps_classes) or None,
+                          start_date, end_date)
+        if any(segment):
+            st.caption(f"{index.count(index.select(segment))} of {index.n} responses")
+    st.session_state[SEGMENT_STATE] = segment
+    return segment
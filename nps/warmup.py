@@ -0,0 +1,121 @@
+"""Warm the data caches and heavy imports before the first page view.
+
+Usage::
+
+    python -m nps.warmup                             # warm up and print the startup report
+    python -m nps.warmup --serve [streamlit options]  # warm up, then serve the dashboard
+
+The loaders, data-quality report, cube, daily counts, segment index,
+response table and comment index are all process-wide caches, and Streamlit
+runs every page in the server process. ``--serve`` therefore fills them in
+the same process before starting the server, so the first viewer after a
+deploy gets warm caches. The pages that draw charts import Plotly, Altair,
+st_aggrid and wordcloud on every run; only the first import in a process
+is slow, so those are imported here as well. Each step is timed with the
+``Profiler``; the report is printed, appended to ``NPS_PROFILE_LOG`` when set
+and shown in the dashboard's performance panel.
+"""
+
+import argparse
+import importlib
+
+from nps.instrument import Profiler
+from nps.loader import DATA_DIR, FORM_CSV, HUBSPOT_CSV
+
+# Chart and grid libraries; the first import in a process is the slow one
+HEAVY_IMPORTS = ['plotly.graph_objects', 'altair', 'st_aggrid', 'wordcloud']
+
+# Report of the last warm-up in this process, for the performance panel
+startup_report = None
+
+
+def warm_up(hubspot_path=HUBSPOT_CSV, form_path=FORM_CSV):
+    """Fill every shared cache and import the chart libraries; return the ``Profiler``."""
+    global startup_report
+    # Imported here so that importing this module stays cheap
+    from nps.cube import load_cube
+    from nps.explorer import load_responses
+    from nps.incremental import state_cube, state_path
+    from nps.quality import quality_report, store_quality_report
+    from nps.report import build_report
+    from nps.rolling import load_daily
+    from nps.search import comment_index
+    from nps.segments import load_segments
+    from nps.store import (store_cube, store_daily, store_linkage_tables, store_path, store_report,
+                           store_segment_values)
+    from nps.text import comment_responses
+
+    profiler = Profiler('startup', enabled=True)
+    for module in HEAVY_IMPORTS:
+        with profiler.stage(f"import {module}"):
+            try:
+                importlib.import_module(module)
+            except ImportError:
+                pass
+
+    with profiler.stage('tables'):
+        build_report(hubspot_path, form_path)
+    with profiler.stage('quality report'):
+        quality_report(hubspot_path, form_path)
+    with profiler.stage('cube'):
+        load_cube(hubspot_path, form_path)
+    with profiler.stage('daily counts'):
+        load_daily(hubspot_path, form_path)
+    with profiler.stage('segment index'):
+        load_segments(hubspot_path, form_path, store=False)
+    with profiler.stage('response table'):
+        load_responses(hubspot_path, form_path)
+    with profiler.stage('comment index'):
+        comment_responses(form_path)
+        comment_index()
+
+    db_path = store_path()
+    if db_path is not None:
+        with profiler.stage('store'):
+            report = store_report(db_path)
+            store_linkage_tables(db_path, report['survey_csat']['Survey Name'].unique())
+            store_segment_values(db_path)
+            store_cube(db_path)
+            store_daily(db_path)
+            store_quality_report(db_path)
+
+    state_file = state_path()
+    if state_file is not None:
+        with profiler.stage('saved counts'):
+            state_cube(state_file)
+
+    startup_report = profiler
+    return profiler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Warm the dashboard caches and report startup times.')
+    parser.add_argument('--hubspot', default=HUBSPOT_CSV, help='HubSpot export')
+    parser.add_argument('--form', default=FORM_CSV, help='Google Form export')
+    parser.add_argument('--serve', action='store_true', help='start the dashboard in this process afterwards')
+    args, streamlit_args = parser.parse_known_args(argv)
+
+    # Through the imported module (not __main__), so the pages see its startup_report
+    from nps import warmup
+
+    profiler = warmup.warm_up(args.hubspot, args.form)
+    print(f"{'stage':<28} {'seconds':>9} {'max RSS':>11}")
+    for record in profiler.records:
+        line = f"{record['stage']:<28} {record['seconds']:8.3f}s {record['max_rss_mb'] or 0:8.1f} MB"
+        if 'traced_peak_mb' in record:
+            line += f" {record['traced_peak_mb']:8.1f} MB traced"
+        print(line)
+    print(f"{'total':<28} {profiler.total_seconds():8.3f}s")
+    profiler.write_log()
+
+    if args.serve:
+        import sys
+
+        from streamlit.web import cli
+
+        sys.argv = ['streamlit', 'run', str(DATA_DIR / '1_Overview.py')] + streamlit_args
+        sys.exit(cli.main())
+
+
+if __name__ == '__main__':
+    main()
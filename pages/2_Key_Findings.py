@@ -2,16 +2,26 @@ import streamlit as st
 import pandas as pd
 import altair as alt
 import plotly.graph_objects as go
+from nps.cube import load_cube, rollup
+from nps.incremental import state_cube, state_path
+from nps.report import DATA_SOURCES, nps_trend, yearly_gauge
+from nps.text import NPS_CLASSES, TEXT_COLUMNS, comment_cohorts, term_frequencies
+from nps.ui import page_profiler, segment_sidebar, show_profile, show_word_cloud
+from nps.rolling import WINDOWS, load_daily, rolling_nps
+from nps.search import search_comments
+from nps.segments import is_empty, segment_cube, segment_daily
+from nps.store import store_cube, store_daily, store_path
 
-# --- Load CSVs ---
-df_form = pd.read_csv('google_form.csv')
-df_hubspot = pd.read_csv('hubspot.csv')
+profiler = page_profiler('Key Findings')
 
 st.set_page_config(layout='wide')
 st.sidebar.success('Select a page above.')
 
 st.sidebar.divider()
 
+# Segment filters shared by every page
+segment = segment_sidebar()
+
 st.header("Key Findings") 
 col1, col2 = st.columns([1, 2])
 
@@ -28,75 +38,28 @@ with col1:
 And to a slightly lesser extent: - coaches, processes, advice, and help all feature highly in comments, showing these are also important to candidates.
 """)
 
-# --- Clean column names ---
-df_hubspot.columns = df_hubspot.columns.str.strip()
-df_form.columns = df_form.columns.str.strip()
-
-# --- Keep only needed columns ---
-# HubSpot already has 'Rating' and 'Date'
-df_hubspot = df_hubspot[['Rating', 'Date']].copy()
-
-# Form CSV: rename and keep only Rating + Date
-df_form = df_form.rename(columns={
-    "How likely are you to recommend the Makers Academy Careers Team to future cohorts?": "Rating",
-    "Conversion Date": "Date"
-})
-
-columns_to_keep = ['Rating', 'Date']
-df_form = df_form[[col for col in columns_to_keep if col in df_form.columns]].copy()
-
-# --- Cleaning function ---
-def clean_df(df):
-    df = df.copy()
-    df['Rating'] = pd.to_numeric(df['Rating'], errors='coerce')
-    df['Date'] = pd.to_datetime(df['Date'], errors='coerce').dt.normalize()
-    df = df.dropna(subset=['Rating', 'Date'])
-    return df
-
-df_hubspot = clean_df(df_hubspot)
-df_form = clean_df(df_form)
-df_combined = pd.concat([df_hubspot, df_form], ignore_index=True)
-
-# --- NPS calculation ---
-def calculate_nps(scores):
-    total = len(scores)
-    if total == 0:
-        return 0
-    promoters = (scores >= 9).sum()
-    detractors = (scores <= 6).sum()
-    return round((promoters - detractors) / total * 100, 0)
-
-# --- Precompute NPS for plotting ---
-def compute_nps_plot_data(df):
-    df = df.copy()
-    df['quarter_year'] = df['Date'].apply(lambda x: f"{x.year}-Q{x.quarter}")
-
-    # Quarterly NPS
-    nps_quarterly = df.groupby('quarter_year')['Rating'].apply(calculate_nps).reset_index()
-    nps_quarterly = nps_quarterly.rename(columns={'Rating': 'Value'})
-    nps_quarterly['Period'] = 'Quarterly'
-
-    # Yearly NPS (plotted at Q4)
-    df['year'] = df['Date'].dt.year
-    nps_yearly = df.groupby('year')['Rating'].apply(calculate_nps).reset_index()
-    nps_yearly = nps_yearly.rename(columns={'Rating': 'Value'})
-    nps_yearly['quarter_year'] = nps_yearly['year'].astype(str) + '-Q4'
-    nps_yearly['Period'] = 'Yearly'
-
-    plot_df = pd.concat([
-        nps_quarterly[['quarter_year', 'Value', 'Period']],
-        nps_yearly[['quarter_year', 'Value', 'Period']]
-    ], ignore_index=True)
-    
-    plot_df = plot_df.sort_values('quarter_year')
-    return plot_df
+# --- NPS cube: response counts by source, survey/cohort, year, quarter and month ---
+# Built once per export version (in SQL when an NPS_DB store is set, from the saved counts when an
+# NPS_STATE file is set, per segment when one is selected); every chart and gauge below sums rows of it
+with profiler.stage('load cube'):
+    db_path = store_path()
+    state_file = state_path()
+    if not is_empty(segment):
+        cube = segment_cube(segment)
+    elif db_path is not None:
+        cube = store_cube(db_path)
+    else:
+        cube = state_cube(state_file) if state_file is not None else load_cube()
+
+# A segment can match no rated responses at all, which leaves no year to select
+if cube.empty:
+    st.info("No rated responses match the selected segment.")
+    show_profile(profiler)
+    st.stop()
 
 # --- Precompute all datasets once ---
-nps_data_dict = {
-    "Combined": compute_nps_plot_data(df_combined),
-    "HubSpot Only": compute_nps_plot_data(df_hubspot),
-    "Forms Only": compute_nps_plot_data(df_form)
-}
+with profiler.stage('trend series'):
+    nps_data_dict = {name: nps_trend(cube, sources) for name, sources in DATA_SOURCES.items()}
 
 with col2:
     # --- NPS GAUGE SECTION ---
@@ -106,8 +69,8 @@ with col2:
 
     with gauge_col1:
         # Get available years from combined data
-        df_combined['year'] = df_combined['Date'].dt.year
-        available_years = sorted(df_combined['year'].unique(), reverse=True)
+        yearly_counts = yearly_gauge(cube)
+        available_years = sorted(yearly_counts.index, reverse=True)
         
         selected_year = st.selectbox(
             "Select Year",
@@ -116,8 +79,8 @@ with col2:
         )
         
         # Calculate NPS for selected year
-        year_data = df_combined[df_combined['year'] == selected_year]
-        nps_score = calculate_nps(year_data['Rating'])
+        year_counts = yearly_counts.loc[selected_year]
+        nps_score = year_counts['NPS Score']
         
         # Determine color based on NPS score
         if nps_score >= 50:
@@ -159,7 +122,8 @@ with col2:
             font={'color': "darkgray", 'family': "Arial"}
         )
         
-        st.plotly_chart(fig, use_container_width=True)
+        with profiler.stage('render gauge'):
+            st.plotly_chart(fig, use_container_width=True)
 
     with gauge_col2:
         st.markdown(f"""
@@ -172,10 +136,10 @@ with col2:
         - **Needs Improvement (<0):** More detractors than promoters
         
         **For {selected_year}:**
-        - Total responses: {len(year_data)}
-        - Promoters (9-10): {(year_data['Rating'] >= 9).sum()}
-        - Passives (7-8): {((year_data['Rating'] >= 7) & (year_data['Rating'] <= 8)).sum()}
-        - Detractors (0-6): {(year_data['Rating'] <= 6).sum()}
+        - Total responses: {int(year_counts['Responses'])}
+        - Promoters (9-10): {int(year_counts['Promoters (9-10)'])}
+        - Passives (7-8): {int(year_counts['Passives (7-8)'])}
+        - Detractors (0-6): {int(year_counts['Detractors (0-6)'])}
         """)
 
 st.markdown("---")
@@ -187,9 +151,16 @@ option = st.selectbox(
     list(nps_data_dict.keys())
 )
 
-plot_data = nps_data_dict[option]
+show_intervals = st.checkbox("Show 95% confidence intervals", key="trend_intervals")
+
+if show_intervals:
+    with profiler.stage('trend intervals'):
+        plot_data = nps_trend(cube, DATA_SOURCES[option], level=0.95)
+else:
+    plot_data = nps_data_dict[option]
 
 # --- Altair chart ---
+
 combined_chart = (
     alt.Chart(plot_data)
     .mark_line(point=True)
@@ -205,7 +176,24 @@ combined_chart = (
     )
 )
 
-st.altair_chart(combined_chart, use_container_width=True)
+if show_intervals:
+    # Bootstrap bands around each series; wide bands mean few responses that period
+    interval_band = (
+        alt.Chart(plot_data)
+        .mark_area(opacity=0.2)
+        .encode(
+            x=alt.X('quarter_year', sort=None),
+            y='NPS Low',
+            y2='NPS High',
+            color=alt.Color('Period', scale=alt.Scale(domain=['Quarterly', 'Yearly'], range=['cyan', 'purple']))
+        )
+    )
+    combined_chart = interval_band + combined_chart.encode(
+        tooltip=['quarter_year', 'Value', 'NPS Low', 'NPS High', 'Period']
+    )
+
+with profiler.stage('render trend chart'):
+    st.altair_chart(combined_chart, use_container_width=True)
 
 if option == "Combined":
     st.markdown("""Due to reasons explained in each graph, combined is really the only way to get a true picture on 
@@ -231,3 +219,140 @@ else:
     st.markdown("""After 2023 it does start to trend back up from it's low point of 34, but overall the NPS in this paints a much
                 different picture to the Hubspot, and in isolation does artificially inflate the NPS.""")
 
+st.markdown("---")
+
+# --- Drill-down: quarterly trend for a single survey or cohort, read from the same cube ---
+st.subheader("Quarterly NPS by Survey / Cohort")
+group_options = [(source, group) for source, group in rollup(cube, ['Source', 'Group']).index if pd.notna(group)]
+selected_source, selected_group = st.selectbox(
+    "Select Survey or Cohort",
+    group_options,
+    format_func=lambda option: f"{option[0]}: {option[1]}",
+    key="group_selector"
+)
+
+with profiler.stage('drill-down series'):
+    group_plot_data = nps_trend(cube, [selected_source], [selected_group])
+group_chart = (
+    alt.Chart(group_plot_data)
+    .mark_line(point=True)
+    .encode(
+        x=alt.X('quarter_year', title='Quarter/Year', sort=None),
+        y=alt.Y('Value', title='NPS Score'),
+        color=alt.Color(
+            'Period',
+            scale=alt.Scale(domain=['Quarterly', 'Yearly'], range=['cyan', 'purple']),
+            title='NPS Type'
+        ),
+        tooltip=['quarter_year', 'Value', 'Period']
+    )
+)
+
+with profiler.stage('render drill-down chart'):
+    st.altair_chart(group_chart, use_container_width=True)
+
+st.markdown("---")
+
+# --- Rolling and cumulative NPS from daily counts; changing the window never rereads the rows ---
+st.subheader("Rolling NPS")
+with profiler.stage('load daily counts'):
+    if not is_empty(segment):
+        daily = segment_daily(segment)
+    else:
+        daily = store_daily(db_path) if db_path is not None else load_daily()
+
+rolling_col1, rolling_col2 = st.columns(2)
+with rolling_col1:
+    series_options = [(name, None) for name in DATA_SOURCES] + group_options
+    rolling_source, rolling_group = st.selectbox(
+        "Select Data Source, Survey or Cohort",
+        series_options,
+        format_func=lambda option: option[0] if option[1] is None else f"{option[0]}: {option[1]}",
+        key="rolling_series"
+    )
+with rolling_col2:
+    window = st.radio("Window", list(WINDOWS), horizontal=True, key="rolling_window")
+
+with profiler.stage('rolling series'):
+    if rolling_group is None:
+        rolling_data = rolling_nps(daily, WINDOWS[window], DATA_SOURCES[rolling_source])
+    else:
+        rolling_data = rolling_nps(daily, WINDOWS[window], [rolling_source], [rolling_group])
+
+rolling_chart = (
+    alt.Chart(rolling_data)
+    .mark_line()
+    .encode(
+        x=alt.X('Date', title='Date'),
+        y=alt.Y('NPS Score', title=f"NPS ({window.lower()})" if WINDOWS[window] else 'Cumulative NPS'),
+        tooltip=['Date', 'NPS Score', 'Responses']
+    )
+)
+
+with profiler.stage('render rolling chart'):
+    st.altair_chart(rolling_chart, use_container_width=True)
+
+st.markdown("---")
+
+# --- Live word cloud: term frequencies over the Google Form comments for any class, year and cohort ---
+# The comment sections have their own filters; the sidebar segment does not apply to them
+st.subheader("Comment Themes")
+st.caption("All Google Form comments, filtered below (the sidebar segment is not applied).")
+text_col1, text_col2 = st.columns([1, 2])
+
+with text_col1:
+    question = st.selectbox("Question", list(TEXT_COLUMNS), key="text_question")
+    selected_classes = st.multiselect("NPS Class", NPS_CLASSES, default=['Promoter'], key="text_classes")
+    text_year = st.selectbox("Year", ['All years'] + available_years, key="text_year")
+    text_cohorts = st.multiselect("Cohort", comment_cohorts(), key="text_cohorts")
+
+with profiler.stage('term frequencies'):
+    frequencies = term_frequencies(
+        question,
+        nps_classes=selected_classes or None,
+        years=None if text_year == 'All years' else [text_year],
+        cohorts=text_cohorts or None,
+        top=100
+    )
+
+with text_col2:
+    with profiler.stage('render word cloud'):
+        show_word_cloud(frequencies)
+
+with text_col1:
+    st.markdown("**Most frequent terms**")
+    st.dataframe(frequencies.head(15).rename('Count'), use_container_width=True)
+
+# --- Comment Search ---
+st.subheader("Search Comments")
+st.caption("Searches all Google Form comments, filtered below (the sidebar segment is not applied).")
+query = st.text_input("Search the form comments", placeholder="e.g. CV interview coach", key="search_query")
+search_col1, search_col2, search_col3 = st.columns(3)
+with search_col1:
+    search_classes = st.multiselect("NPS Class", NPS_CLASSES, key="search_classes")
+with search_col2:
+    search_cohorts = st.multiselect("Cohort", comment_cohorts(), key="search_cohorts")
+with search_col3:
+    search_dates = st.date_input("Responses between", value=(), key="search_dates")
+
+if query:
+    start_date, end_date = (search_dates + (None, None))[:2] if search_dates else (None, None)
+    with profiler.stage('comment search'):
+        results = search_comments(
+            query,
+            nps_classes=search_classes or None,
+            cohorts=search_cohorts or None,
+            start_date=start_date,
+            end_date=end_date,
+        )
+    st.caption(f"{len(results)} matching responses (best first, up to 50)")
+    for _, row in results.iterrows():
+        cohort = row['Cohort'] if pd.notna(row['Cohort']) else 'No cohort'
+        rating = f"{row['NPS Class']}** ({int(row['Rating'])})" if pd.notna(row['Rating']) else "No rating**"
+        date = f"{row['Date']:%d %b %Y}" if pd.notna(row['Date']) else 'No date'
+        st.markdown(f"**{rating} · {cohort} · {date}")
+        for answer_to in TEXT_COLUMNS:
+            if row[answer_to]:
+                st.markdown(f"> *{answer_to}* {row[answer_to]}")
+
+show_profile(profiler)
@@ -1,7 +1,4 @@
 import streamlit as st
-import pandas as pd
-from scipy import stats
-from st_aggrid import GridOptionsBuilder, AgGrid, ColumnsAutoSizeMode
 
 st.set_page_config(layout='wide')
 st.sidebar.success('Select a page above.')
@@ -0,0 +1,92 @@
+import math
+
+import streamlit as st
+from st_aggrid import GridOptionsBuilder, AgGrid, ColumnsAutoSizeMode
+from nps.explorer import PAGE_SIZES, RESPONSE_COLUMNS, load_responses
+from nps.segments import is_empty, load_segments
+from nps.text import NPS_CLASSES
+from nps.ui import page_profiler, segment_sidebar, show_profile
+
+profiler = page_profiler('Response Explorer')
+
+st.set_page_config(layout='wide')
+st.sidebar.success('Select a page above.')
+
+st.sidebar.divider()
+
+# Segment filters shared by every page
+segment = segment_sidebar()
+
+st.header("Response Explorer")
+
+st.markdown("""Every HubSpot and Google Form response in one table. Filtering, sorting and paging happen on the
+            server, so only the rows of the page being viewed are sent to the browser.""")
+
+# Combined rows, built once per export version and shared across sessions
+with profiler.stage('load responses'):
+    responses = load_responses()
+
+# --- Server-side filters ---
+filter_col1, filter_col2, filter_col3 = st.columns(3)
+with filter_col1:
+    sources = st.multiselect("Source", ['HubSpot', 'Google Form'], key="explorer_sources")
+    groups = st.multiselect("Survey / Cohort", sorted(responses.df['Survey / Cohort'].dropna().unique()),
+                            key="explorer_groups")
+with filter_col2:
+    nps_classes = st.multiselect("NPS Class", NPS_CLASSES, key="explorer_classes")
+    ratings = st.slider("Rating", 0, 10, (0, 10), key="explorer_ratings")
+with filter_col3:
+    dates = st.date_input("Responses between", value=(), key="explorer_dates")
+    text = st.text_input("Comment contains", key="explorer_text")
+
+# --- Columns, sort and paging ---
+view_col1, view_col2, view_col3, view_col4 = st.columns([3, 1, 1, 1])
+with view_col1:
+    columns = st.multiselect("Columns", RESPONSE_COLUMNS, default=RESPONSE_COLUMNS[:7], key="explorer_columns")
+with view_col2:
+    sort_by = st.selectbox("Sort by", ['Date', 'Rating', 'Source', 'Survey / Cohort', 'NPS Class'],
+                           key="explorer_sort")
+with view_col3:
+    ascending = st.radio("Order", ['Newest / highest first', 'Oldest / lowest first'],
+                         key="explorer_order") == 'Oldest / lowest first'
+with view_col4:
+    page_size = st.selectbox("Rows per page", PAGE_SIZES, key="explorer_page_size")
+
+start_date, end_date = (dates + (None, None))[:2] if dates else (None, None)
+# The response table holds the exports' rows (comments are not in an NPS_DB store)
+segments = load_segments(store=False)
+filters = dict(
+    sources=sources or None,
+    groups=groups or None,
+    nps_classes=nps_classes or None,
+    ratings=None if ratings == (0, 10) else ratings,
+    start_date=start_date,
+    end_date=end_date,
+    text=text or None,
+    # Rows line up with the segment index: HubSpot rows first, then the form rows
+    within=None if is_empty(segment) else segments.mask(segments.select(segment)),
+)
+
+with profiler.stage('filter rows'):
+    mask = responses.mask(**filters)
+matches = int(mask.sum())
+pages = max(math.ceil(matches / page_size), 1)
+page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, key="explorer_page")
+
+with profiler.stage('query page'):
+    rows, matches = responses.page(page - 1, page_size, sort_by, ascending, columns or RESPONSE_COLUMNS, mask=mask)
+
+st.caption(f"{matches} matching responses of {len(responses)}; showing {len(rows)}")
+
+# --- Grid of the current page only ---
+gb = GridOptionsBuilder.from_dataframe(rows)
+gb.configure_default_column(resizable=True, wrapText=True, autoHeight=True)
+with profiler.stage('render grid'):
+    AgGrid(
+        rows,
+        gridOptions=gb.build(),
+        columns_auto_size_mode=ColumnsAutoSizeMode.FIT_CONTENTS,
+        height=600,
+    )
+
+show_profile(profiler)
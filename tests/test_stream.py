@@ -0,0 +1,60 @@
+"""Streamed aggregates must equal the in-memory tables, missing groups included."""
+
+import pandas as pd
+import pytest
+
+from nps.loader import FORM_RATING, load_form, load_hubspot
+from nps.report import cohort_table, combined_yearly_nps, form_overall_table, survey_tables, yearly_nps
+from nps.stream import stream_exports, streamed_report
+
+
+@pytest.fixture
+def exports(tmp_path):
+    hubspot = pd.DataFrame({
+        'Record ID': range(1, 13),
+        'Contact Id': range(101, 113),
+        'Rating': [9, 10, 3, 7, 2, 1, 8, 0, 6, 10, 9, 5],
+        'Date': ['2019-03-01 10:00', '2020-05-02 11:30', '2021-07-03 09:15', '2021-08-04 14:00',
+                 '2021-09-05 16:45', '2021-10-06 08:00', '2022-01-07 12:00', '2022-02-08 13:00',
+                 '2023-03-09 10:00', '2024-04-10 11:00', '2024-05-11 12:00', '2025-06-12 09:00'],
+        'Survey Name': ['Exit', 'Exit', None, 'Exit', 'CSAT', 'CSAT', 'Support', 'CSAT',
+                        None, 'Support', 'Exit', 'Support'],
+    })
+    form = pd.DataFrame({
+        'Conversion Date': ['2019-05-09 11:07:55', '2020-06-10 12:00:00', '2021-07-11 13:00:00',
+                            '2022-08-12 14:00:00', '2023-09-13 15:00:00', '2024-10-14 16:00:00',
+                            '2024-11-15 17:00:00'],
+        "What's your cohort?": ['April', None, 'May', None, 'April', '*redacted*', None],
+        FORM_RATING: ['10', '9', '*redacted*', '4', '8', '7', ''],
+    })
+    hubspot_path, form_path = tmp_path / 'hubspot.csv', tmp_path / 'google_form.csv'
+    hubspot.to_csv(hubspot_path, index=False)
+    form.to_csv(form_path, index=False)
+    return hubspot_path, form_path
+
+
+@pytest.mark.parametrize('chunksize', [1, 3, 100])
+def test_streamed_tables_match_in_memory(exports, chunksize):
+    hubspot_path, form_path = exports
+    df_hubspot = load_hubspot(hubspot_path, columns=['Survey Name', 'Rating', 'Date'])
+    df_form = load_form(form_path, columns=['Cohort', 'Rating', 'Date'])
+    df_analysis, df_analysis_nps, df_csat = survey_tables(df_hubspot)
+    hubspot_yearly = yearly_nps(df_hubspot, df_csat['Survey Name'].unique())
+    form_yearly = yearly_nps(df_form)
+    expected = {
+        'survey_analysis': df_analysis,
+        'survey_nps': df_analysis_nps,
+        'survey_csat': df_csat,
+        'cohort_nps': cohort_table(df_form),
+        'form_overall_nps': form_overall_table(df_form),
+        'hubspot_yearly_nps': hubspot_yearly,
+        'form_yearly_nps': form_yearly,
+        'combined_yearly_nps': combined_yearly_nps(hubspot_yearly, form_yearly),
+    }
+
+    report = streamed_report(*stream_exports(hubspot_path, form_path, chunksize))
+    for name, table in expected.items():
+        streamed = report[name]
+        assert 'nan' not in set(streamed.iloc[:, 0].astype(object).dropna()), name
+        pd.testing.assert_frame_equal(streamed.reset_index(drop=True), table.reset_index(drop=True),
+                                      check_dtype=False, check_index_type=False, obj=name)